@@ -1,5 +1,6 @@
 import streamlit as st
-from PIL import Image
+
+from portfolio import analytics, contact, content, images, profiles, sessions, slowreruns, warmup, watcher
 
 # Configure the page
 st.set_page_config(
@@ -191,10 +192,51 @@ def local_css():
     </style>
     """, unsafe_allow_html=True)
 
+# Function to display the contact form
+def contact_form(recipient):
+    """
+    Display the contact form
+    
+    Parameters:
+    -----------
+    recipient : str
+        Address the submissions are delivered to
+    
+    Submissions are only validated and queued here; a background worker
+    delivers them, so the submit rerun stays fast.
+    """
+    with st.form("contact"):
+        name = st.text_input("Name")
+        email = st.text_input("Email")
+        message = st.text_area("Message")
+        submitted = st.form_submit_button("Send")
+    
+    if not submitted:
+        return
+    
+    bucket = st.session_state.setdefault("contact_rate", {})
+    if not contact.allow_submission(bucket):
+        st.warning("You've sent several messages in a short time. Please try again in a few minutes.")
+        return
+    try:
+        contact.enqueue(recipient, name, email, message)
+    except contact.ValidationError as e:
+        st.error(str(e))
+        return
+    st.success("Thanks! Your message is on its way.")
+
 def main():
     # Remove all other custom CSS that might be overriding our settings
     # and just use the modified local_css() function
+    watcher.ensure_started()
+    warmup.ensure_started()
+    contact.ensure_started()
+    sessions.ensure_started()
     local_css()
+    profile = profiles.current()
+    info = content.profile_info(profile)
+    analytics.handle_outbound("home", profile)
+    analytics.page_view("home", profile)
     
     with st.sidebar:
         st.title("Navigation")
@@ -202,13 +244,17 @@ def main():
         
         st.sidebar.markdown("### Menu")
         home = st.sidebar.button("Home", key="home", use_container_width=True)
+        if home:
+            analytics.nav_click("home", "home", profile)
         
         projects = st.sidebar.button("Projects", key="projects", use_container_width=True)
         if projects:
+            analytics.nav_click("home", "projects", profile)
             st.switch_page("pages/projects.py")
 
         papers = st.sidebar.button("Researches", key="researches", use_container_width=True)
         if papers:
+            analytics.nav_click("home", "research", profile)
             st.switch_page("pages/research.py")
             
     st.markdown('<div class="intro-section" style="padding: 0; margin: 0;">', unsafe_allow_html=True)
@@ -218,36 +264,27 @@ def main():
     
     with col1:
         st.markdown('<div class="image-container">', unsafe_allow_html=True)
-        profile_pic_path = "assets/photo.jpg"
-        try:
-            profile_img = Image.open(profile_pic_path)
-            # Calculate height to maintain aspect ratio when width is 300px
-            width, height = profile_img.size
-            new_width = 300
-            new_height = int((new_width / width) * height)
-            
-            # Resize the image while maintaining aspect ratio
-            resized_img = profile_img.resize((new_width, new_height), Image.LANCZOS)
-            st.image(resized_img, use_container_width=False, width=new_width, output_format="JPEG", clamp=True)
-        except Exception as e:
-            st.error(f"Could not load image: {e}")
-            st.write("Please ensure the image path is correct.")
+        profile_pic_path = info.get("photo")
+        # Profiles without a photo simply leave the column empty
+        if profile_pic_path:
+            try:
+                # Resized once per process (aspect ratio kept) and cached
+                new_width = images.PROFILE_PHOTO_WIDTH
+                resized_img = images.resized(profile_pic_path, new_width, profile)
+                st.image(resized_img, use_container_width=False, width=new_width, output_format="JPEG", clamp=True)
+            except Exception as e:
+                st.error(f"Could not load image: {e}")
+                st.write("Please ensure the image path is correct.")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         # Simple div without additional styling to let CSS control it
         st.markdown('<div class="text-container">', unsafe_allow_html=True)
-        st.markdown("""
+        st.markdown(f"""
         <div class="profile-header" style="margin-left: 0; padding-left: 0;">
-            <div class="profile-title" style="margin-left: 0;">Welcome to my page! 🔥🔥🔥</div>
+            <div class="profile-title" style="margin-left: 0;">{info["greeting"]}</div>
             <div class="profile-intro" style="margin-left: 0; text-align: left;">
-            Hi, my name is Fadhel! I'm a dedicated AI Engineer with over two years of experience in the field. 
-            My passion lies in crafting innovative solutions with AI, and I'm always eager to expand my knowledge and skills.
-            <br><br>
-            In my free time, you can find me pushing the limits as a hardstuck Diamond 1 player in Valorant 😂.
-            <br><br>
-            I hold a degree in Computer Engineering from Brawijaya University. 
-            Throughout my career, I've worked with various companies, delivering impactful solutions that drive meaningful change.
+            {info["intro"]}
             </div>
         </div>
         """, unsafe_allow_html=True)
@@ -259,15 +296,17 @@ def main():
     
     with col1:
         st.markdown("### Contact Information")
-        st.markdown("📧 fadhel1597@gmail.com")
+        st.markdown(f"📧 {info['email']}")
+        contact_form(info["email"])
     
     with col2:
         st.markdown("### Links")
-        st.markdown("""
-        - [GitHub](https://github.com/FadhelHaidar)
-        - [LinkedIn](https://linkedin.com/in/fadhel-haidar)
-        """)
+        st.markdown("\n".join(
+            f"- [{label}]({analytics.outbound_href(url, profile, 'home')})" for label, url in info.get("links", {}).items()
+        ))
 
         
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Samples the stack if this rerun gets slow (opt-in, see portfolio/slowreruns.py)
+    with slowreruns.watch("home"):
+        main()
\ No newline at end of file
@@ -1,6 +1,8 @@
 import streamlit as st
 import os
-from PIL import Image
+
+from portfolio import analytics, cache, content, fragments, profiles, sessions, slowreruns, thumbnails, warmup, watcher
+from portfolio.embed import embed_url
 
 # Page configuration
 st.set_page_config(
@@ -79,18 +81,6 @@ def local_css():
     """, unsafe_allow_html=True)
 
 # Function to display video
-def extract_youtube_id(url):
-    """Extract the YouTube video ID from various YouTube URL formats"""
-    if "youtube.com/shorts/" in url:
-        return url.split("youtube.com/shorts/")[1].split("?")[0].split("/")[0]
-    elif "youtube.com/watch?v=" in url:
-        return url.split("v=")[1].split("&")[0]
-    elif "youtube.com/embed/" in url:
-        return url.split("embed/")[1].split("?")[0]
-    elif "youtu.be/" in url:
-        return url.split("youtu.be/")[1].split("?")[0]
-    return None
-
 def display_video(video_url=None, video_path=None):
     """
     Display a video either from a URL or local path
@@ -116,30 +106,12 @@ def display_video(video_url=None, video_path=None):
             pass
         
         # If that failed, try our custom embedding approach
-        if "youtube" in video_url.lower():
-            video_id = extract_youtube_id(video_url)
-            if video_id:
-                embed_url = f"https://www.youtube.com/embed/{video_id}"
-                st.markdown(f"""
-                <div style="position: relative; padding-bottom: 56.25%; height: 0; overflow: hidden; max-width: 100%; background: #000;">
-                    <iframe
-                        src="{embed_url}"
-                        frameborder="0"
-                        allowfullscreen
-                        style="position: absolute; top: 0; left: 0; width: 100%; height: 100%;"
-                    ></iframe>
-                </div>
-                """, unsafe_allow_html=True)
-                return True
-        
-        elif "vimeo" in video_url.lower():
-            # Extract Vimeo ID
-            video_id = video_url.split("/")[-1]
-            embed_url = f"https://player.vimeo.com/video/{video_id}"
+        url = embed_url(video_url)
+        if url:
             st.markdown(f"""
             <div style="position: relative; padding-bottom: 56.25%; height: 0; overflow: hidden; max-width: 100%; background: #000;">
                 <iframe
-                    src="{embed_url}"
+                    src="{url}"
                     frameborder="0"
                     allowfullscreen
                     style="position: absolute; top: 0; left: 0; width: 100%; height: 100%;"
@@ -165,7 +137,10 @@ def display_project(
     video_url=None,
     video_path=None,
     image_path=None,
-    links=None
+    links=None,
+    gallery=None,
+    entry_id=None,
+    profile=content.DEFAULT_PROFILE
 ):
     """
     Display a single project with customizable content
@@ -190,12 +165,22 @@ def display_project(
         Path to a local image file (fallback if no video)
     links : dict, optional
         Dictionary of link labels and URLs, e.g., {"GitHub Repository": "https://github.com/..."}
+    gallery : list, optional
+        Screenshots shown as thumbnails below the project, as paths or
+        {"path": ..., "caption": ...} dicts
+    entry_id : str, optional
+        Id of the entry in the profile's projects.json; rendered fragments are cached under it
+    profile : str, optional
+        Profile the entry belongs to
     """
     st.markdown('<div class="project-container">', unsafe_allow_html=True)
     st.markdown(f'<h2 class="project-title">{title}</h2>', unsafe_allow_html=True)
     
     # Display tags
-    tags_html = " ".join([f'<span class="tag">{tag}</span>' for tag in tags])
+    tags_html = cache.fragment(
+        profile, "projects", entry_id, "tags",
+        lambda: fragments.tags_html(tags)
+    )
     st.markdown(tags_html, unsafe_allow_html=True)
     
     col1, col2 = st.columns([2, 1])
@@ -218,32 +203,32 @@ def display_project(
         
         # Fallback to image if video not displayed
         if not video_displayed and image_path and os.path.exists(image_path):
-            st.image(Image.open(image_path))
+            thumbnails.display_gallery(thumbnails.gallery_items(image_path), f"{profile}-{entry_id or title}-image", columns=1)
         elif not video_displayed:
             st.info("Add project image or video to showcase your work")
         
         # Project links
         if links and len(links) > 0:
             st.markdown("### Links")
-            for label, url in links.items():
-                # Choose icon based on common link types
-                icon = "🔗"  # Default icon
-                if "github" in url.lower():
-                    icon = "🔗"
-                elif "demo" in label.lower() or "live" in label.lower():
-                    icon = "🌐"
-                elif "case" in label.lower() or "study" in label.lower() or "doc" in label.lower():
-                    icon = "📄"
-                elif "result" in label.lower() or "analysis" in label.lower():
-                    icon = "📊"
-                
-                st.markdown(f"[{icon} {label}]({url})")
+            st.markdown(cache.fragment(profile, "projects", entry_id, "links", lambda: fragments.project_links_markdown(links, profile)))
+    
+    # Image gallery (thumbnails only until a full-size view is requested)
+    gallery_items = thumbnails.gallery_items(gallery=gallery)
+    if gallery_items:
+        st.markdown("### Gallery")
+        thumbnails.display_gallery(gallery_items, f"{profile}-{entry_id or title}-gallery")
     
     st.markdown('</div>', unsafe_allow_html=True)
     st.divider()
 
 def main():
+    watcher.ensure_started()
+    warmup.ensure_started()
+    sessions.ensure_started()
     local_css()
+    profile = profiles.current()
+    analytics.handle_outbound("projects", profile)
+    analytics.page_view("projects", profile)
     
     with st.sidebar:
         st.title("Navigation")
@@ -252,101 +237,24 @@ def main():
         st.sidebar.markdown("### Menu")
         home = st.sidebar.button("Home", key="home", use_container_width=True)
         if home:
+            analytics.nav_click("projects", "home", profile)
             st.switch_page("main.py")
             
         projects = st.sidebar.button("Projects", key="projects", use_container_width=True)
+        if projects:
+            analytics.nav_click("projects", "projects", profile)
 
         papers = st.sidebar.button("Researches", key="researches", use_container_width=True)
         if papers:
+            analytics.nav_click("projects", "research", profile)
             st.switch_page("pages/research.py")
     
     st.title("My Projects")
     
-    display_project(
-        title="Skin Analysis AI",
-        tags=["Computer Vision"],
-        description="""
-            A feature that uses DETR object detection model with a custom dataset to identify acne
-            problems, InceptionV3 for wrinkle classification, mediapipe for facial landmark detection,
-            and VGG16 for skin type classification. The same method for wrinkle detection is applied to
-            detect dark circles under the eyes.
-        """,
-        key_features=[
-            "Object Detection",
-            "Landmark Detection",
-            "Image Classification",
-        ],
-        technologies=[
-            "Flask API",
-            "Tensorflow",
-            "Transformers"
-        ],
-        video_url="https://www.youtube.com/embed/sdrObaXCZVc",
-    )
-    
-    # Example of using the template for Project 2
-    display_project(
-        title="Facial Ratio Measurement AI",
-        tags=["Computer Vision"],
-        description="""
-            Using EfficientNetV2, the system can classify the shape of the face. It also calculates the width-
-            to-length ratio of the face using Euclidean Distance to measure the distance between facial landmarks.
-        """,
-        key_features=[
-            "Object Detection",
-            "Landmark Detection",
-            "Image Classification",
-        ],
-        technologies=[
-            "Flask API",
-            "Tensorflow",
-            "Transformers"
-        ],
-        video_url="https://www.youtube.com/embed/qANcUrKSWHU",
-
-    )
-    
-    # Example of using the template for Project 3
-    display_project(
-        title="Human Tracking System for Smart Wheelchair",
-        tags=["Computer Vision", "Robotics"],
-        description="""
-            The system Leveraging YOLOv5 and byte track to create auto navigation by following human
-            in front of the smart wheelchair captured by web camera. The system is embedded to Nvidia
-            Jetson TX2.
-        """,
-        key_features=[
-            "Object Detection",
-            "Object Tracking",
-        ],
-        technologies=[
-            "Nvidia Jetson",
-            "Arduino",
-            "Pytorch"
-        ],
-        video_url="https://youtu.be/F_w_tT8pDR4",
-    )
-
-    display_project(
-        title="Room Name Recognition System",
-        tags=["Computer Vision", "Robotics"],
-        description="""
-            The system contained object detection to detect the plate using YOLOv5 and read/recognize
-            the plate character using EasyOCR, the object captured using web camera. The system is
-            embedded to Nvidia Jetson TX2.
-            """,
-        key_features=[
-            "Object Detection",
-            "OCR",
-        ],
-        technologies=[
-            "Nvidia Jetson",
-            "Arduino",
-            "Pytorch",
-        ],
-        video_url="https://youtu.be/HYcV47oXoCE",
-
-    )
+    for entry_id, project in content.entries("projects", profile):
+        display_project(entry_id=entry_id, profile=profile, **project)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Samples the stack if this rerun gets slow (opt-in, see portfolio/slowreruns.py)
+    with slowreruns.watch("projects"):
+        main()
\ No newline at end of file
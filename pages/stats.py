@@ -0,0 +1,123 @@
+import streamlit as st
+import time
+
+from portfolio import analytics, profiles, sessions, slowreruns
+
+# Page configuration
+st.set_page_config(
+    page_title="Stats | My Portfolio",
+    page_icon="📈",
+    layout="wide"
+)
+
+# Time windows offered in the selector, in days
+WINDOWS = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30, "Last 365 days": 365}
+
+# Aggregates are cheap, but there is no need to query on every widget rerun
+@st.cache_data(ttl=60)
+def load_stats(days, profile):
+    since = time.time() - days * 24 * 60 * 60
+    return {
+        "summary": analytics.summary(since, profile),
+        "views_by_page": analytics.counts_by(analytics.PAGE_VIEW, "page", since, profile=profile),
+        "nav_by_target": analytics.counts_by(analytics.NAV_CLICK, "target", since, profile=profile),
+        "top_outbound": analytics.counts_by(analytics.OUTBOUND_CLICK, "target", since, profile=profile),
+        "daily_views": analytics.daily_page_views(since, profile),
+    }
+
+# Function to show the memory held by each open session
+def display_sessions():
+    report = sessions.account()
+    st.markdown("### Sessions")
+    if not report:
+        st.caption("Session accounting is only available under `streamlit run`.")
+        return
+    total = sessions.total_bytes(report)
+    st.table([
+        {
+            "Session": row["id"][:8],
+            "Connected": "yes" if row["connected"] else "no",
+            "Runs": row["runs"],
+            "Idle": f"{row['idle'] / 60:.0f} min",
+            "State": f"{row['state_bytes'] / 1024:.0f} KB",
+            "Media": f"{row['media_files']} files, {row['media_bytes'] / 1024:.0f} KB",
+        }
+        for row in report
+    ])
+    evicted = sessions.stats()
+    idle_limit = f"{sessions.IDLE_TIMEOUT / 60:.0f} min" if sessions.IDLE_TIMEOUT > 0 else "off"
+    st.caption(
+        f"{len(report)} sessions hold {total / 2**20:.1f} MB of {sessions.MEMORY_CEILING / 2**20:.0f} MB; "
+        f"idle timeout {idle_limit}. {evicted['evicted']} sessions evicted and media of "
+        f"{evicted['released_media']} expired sessions released since this process started."
+    )
+
+def main():
+    sessions.ensure_started()
+    # Each portfolio only sees the visitors of its own pages
+    profile = profiles.current()
+    with st.sidebar:
+        st.title("Navigation")
+        st.markdown('<div class="sidebar-nav">', unsafe_allow_html=True)
+
+        st.sidebar.markdown("### Menu")
+        home = st.sidebar.button("Home", key="home", use_container_width=True)
+        if home:
+            st.switch_page("main.py")
+
+        projects = st.sidebar.button("Projects", key="projects", use_container_width=True)
+        if projects:
+            st.switch_page("pages/projects.py")
+
+        papers = st.sidebar.button("Researches", key="researches", use_container_width=True)
+        if papers:
+            st.switch_page("pages/research.py")
+
+    st.title("Visitor Stats")
+
+    window = st.selectbox("Period", list(WINDOWS), index=1)
+    stats = load_stats(WINDOWS[window], profile)
+    summary = stats["summary"]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Page views", summary["page_views"])
+    col2.metric("Sessions", summary["sessions"])
+    col3.metric("Navigation clicks", summary["nav_clicks"])
+    col4.metric("Outbound clicks", summary["outbound_clicks"])
+
+    if stats["daily_views"]:
+        st.markdown("### Page views per day")
+        st.bar_chart({"Views": {day: count for day, count in stats["daily_views"]}})
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("### Views by page")
+        st.table([{"Page": page, "Views": count} for page, count in stats["views_by_page"]])
+
+        st.markdown("### Sidebar navigation")
+        st.table([{"Target": target, "Clicks": count} for target, count in stats["nav_by_target"]])
+
+    with col2:
+        st.markdown("### Top outbound links")
+        st.table([{"URL": url, "Clicks": count} for url, count in stats["top_outbound"]])
+
+    writer = analytics.stats()
+    st.caption(
+        f"Writer: {writer['written']} events written, {writer['queued']} queued, "
+        f"{writer['dropped']} dropped since this process started."
+    )
+    resident = profiles.resident()
+    st.caption(
+        f"Profiles in memory: {len(resident)} of at most {profiles.MAX_PROFILES}, "
+        f"caches {profiles.cached_bytes() / 2**20:.1f} MB of {profiles.MEMORY_BUDGET / 2**20:.0f} MB."
+    )
+
+    # Per-session details are for the operator only
+    if sessions.debug_allowed(st.query_params.get("debug")):
+        display_sessions()
+
+if __name__ == "__main__":
+    # Samples the stack if this rerun gets slow (opt-in, see portfolio/slowreruns.py)
+    with slowreruns.watch("stats"):
+        main()
\ No newline at end of file
@@ -0,0 +1 @@
+"""Shared helpers for the portfolio pages (content, caching, build tooling)."""
@@ -0,0 +1,318 @@
+"""
+Visitor analytics: page views, sidebar navigation and outbound link clicks.
+
+Pages call :func:`record` (or the Streamlit helpers below), which only puts
+the event on a bounded in-process queue. A background writer thread drains
+the queue and inserts events into SQLite (WAL mode) in batches, every
+``FLUSH_INTERVAL`` seconds or ``BATCH_SIZE`` events, whichever comes first.
+When the queue is full, events are dropped and counted rather than making a
+rerun wait on the disk.
+
+Outbound clicks are tracked by pointing links at the ``/go`` endpoint of
+the JSON API server (:mod:`portfolio.api`), which records the click and
+answers with a plain ``302``. A click costs one small HTTP request, not a
+Streamlit session. ``PORTFOLIO_OUTBOUND_URL`` (or ``serve --outbound-url``)
+is the public address of that endpoint; without it links point straight at
+their targets and clicks are not counted. Only URLs the site itself renders
+are redirected to, so the endpoint cannot be abused as an open redirect.
+
+Every event is stored with the profile it was recorded under, and the
+aggregates take a ``profile`` so each portfolio only sees its own visitors.
+Databases from before the ``profile`` column are migrated on open; their
+events are attributed to the default profile.
+"""
+import html
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import quote
+
+import streamlit as st
+
+from portfolio import content
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.path.join(content.CACHE_DIR, "analytics.db")
+
+MAX_QUEUE = 10000
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 0.3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    page TEXT NOT NULL,
+    target TEXT,
+    session TEXT,
+    profile TEXT
+);
+CREATE INDEX IF NOT EXISTS events_kind_ts ON events (kind, ts);
+"""
+
+# Created after the migration, which adds the column it needs
+PROFILE_INDEX = "CREATE INDEX IF NOT EXISTS events_profile_kind_ts ON events (profile, kind, ts)"
+
+PAGE_VIEW = "page_view"
+NAV_CLICK = "nav_click"
+OUTBOUND_CLICK = "outbound_click"
+
+# Public URL of the click-recording redirect, e.g. https://example.com/go
+OUTBOUND_URL = os.environ.get("PORTFOLIO_OUTBOUND_URL")
+
+_queue = queue.Queue(maxsize=MAX_QUEUE)
+_stats = {"dropped": 0, "written": 0}
+_writer = None
+_writer_lock = threading.Lock()
+# Database paths whose schema is known to be current
+_migrated = set()
+
+# URLs rendered as outbound links; only these are redirected to
+_outbound = set()
+
+
+def connect(path=DB_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    _migrate(conn)
+    _migrated.add(path)
+    return conn
+
+
+def _migrate(conn):
+    """Add the ``profile`` column to a database created before it existed"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+    if "profile" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE events ADD COLUMN profile TEXT")
+            conn.execute("UPDATE events SET profile = ?", (content.DEFAULT_PROFILE,))
+    conn.execute(PROFILE_INDEX)
+
+
+class EventWriter(threading.Thread):
+    """Drain the event queue into SQLite in batches"""
+
+    def __init__(self, events, path=DB_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        super().__init__(name="analytics-writer", daemon=True)
+        self.events = events
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    def run(self):
+        conn = connect(self.path)
+        while True:
+            batch = [self.events.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.events.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO events (ts, kind, page, target, session, profile) VALUES (?, ?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                _stats["written"] += len(batch)
+            except sqlite3.Error:
+                logger.exception("Dropping %d analytics events", len(batch))
+                _stats["dropped"] += len(batch)
+
+
+def ensure_started():
+    """Start the writer thread once per process"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = EventWriter(_queue)
+            _writer.start()
+    return _writer
+
+
+def record(kind, page, target=None, session=None, profile=content.DEFAULT_PROFILE):
+    """
+    Queue an event without blocking; drops it if the queue is full
+
+    Parameters:
+    -----------
+    kind : str
+        One of PAGE_VIEW, NAV_CLICK, OUTBOUND_CLICK
+    page : str
+        Page the event happened on ("home", "projects", "research")
+    target : str, optional
+        Navigation target or outbound URL
+    session : str, optional
+        Anonymous per-tab session id
+    profile : str, optional
+        Portfolio the event belongs to
+    """
+    ensure_started()
+    try:
+        _queue.put_nowait((time.time(), kind, page, target, session, profile))
+    except queue.Full:
+        _stats["dropped"] += 1
+
+
+def stats():
+    """Return writer counters (queued, written, dropped) for the stats page"""
+    return {"queued": _queue.qsize(), **_stats}
+
+
+# ---------------------------------------------------------------------------
+# Streamlit helpers
+# ---------------------------------------------------------------------------
+
+def session_id():
+    """Return an anonymous id for the current browser tab"""
+    if "analytics_session" not in st.session_state:
+        st.session_state.analytics_session = uuid.uuid4().hex
+    return st.session_state.analytics_session
+
+
+def page_view(page, profile=content.DEFAULT_PROFILE):
+    """Record a page view once per visit, not on every widget rerun"""
+    visit = (page, profile)
+    if st.session_state.get("analytics_page") != visit:
+        st.session_state.analytics_page = visit
+        record(PAGE_VIEW, page, session=session_id(), profile=profile)
+
+
+def nav_click(page, target, profile=content.DEFAULT_PROFILE):
+    record(NAV_CLICK, page, target, session_id(), profile)
+
+
+def outbound_href(url, profile=content.DEFAULT_PROFILE, page=None):
+    """Return a link target that records the click before leaving the site"""
+    if not OUTBOUND_URL:
+        return url
+    _outbound.add(url)
+    href = f"{OUTBOUND_URL}?url={quote(url, safe='')}"
+    if page:
+        href += "&page=" + quote(page, safe="")
+    if profile != content.DEFAULT_PROFILE:
+        href += "&profile=" + quote(profile, safe="")
+    return href
+
+
+def _is_known_outbound(url, profile):
+    if url in _outbound:
+        return True
+    # Profiles not loaded by a page are read without caching them: the /go
+    # endpoint does not go through profiles.activate, so anything it put in
+    # the caches would sit outside the memory budget
+    if profile in content.loaded_profiles():
+        info = content.profile_info(profile)
+        rows = [fields for kind in content.FILES for _, fields in content.entries(kind, profile)]
+    else:
+        info = content.read_profile(profile)
+        rows = [fields for kind in content.FILES for fields in content.read_entries(kind, profile)]
+    if url in info.get("links", {}).values():
+        return True
+    for fields in rows:
+        known = list((fields.get("links") or {}).values())
+        known += [fields.get("video_url"), fields.get("pdf_url")]
+        if url in known:
+            return True
+    return False
+
+
+def follow_outbound(url, page=None, profile=content.DEFAULT_PROFILE):
+    """
+    Record an outbound click; returns False for URLs the site does not link to
+
+    Called by the ``/go`` endpoint, outside any Streamlit session.
+    """
+    if not url or not _is_known_outbound(url, profile):
+        return False
+    record(OUTBOUND_CLICK, page or "unknown", url, profile=profile)
+    return True
+
+
+def handle_outbound(page, profile=content.DEFAULT_PROFILE):
+    """
+    Follow a ``?go=`` link from before clicks moved to the ``/go`` endpoint
+
+    Old links may still be bookmarked or shared. Does nothing when the page
+    was not opened through one.
+    """
+    url = st.query_params.get("go")
+    if not url:
+        return
+    if not follow_outbound(url, page, profile):
+        st.warning("This link does not point to a page listed on this site.")
+        st.markdown(f"Continue to `{url}` at your own risk.")
+        st.stop()
+    st.markdown(f'<meta http-equiv="refresh" content="0; url={html.escape(url)}">', unsafe_allow_html=True)
+    st.markdown(f"Redirecting to [{url}]({url})...")
+    st.stop()
+
+
+# ---------------------------------------------------------------------------
+# Aggregates for the stats page
+# ---------------------------------------------------------------------------
+
+def _query(sql, params=(), path=DB_PATH):
+    if not os.path.exists(path):
+        return []
+    # Reads are read-only, so bring an old database up to date first
+    if path not in _migrated:
+        connect(path).close()
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def summary(since, profile=content.DEFAULT_PROFILE, path=DB_PATH):
+    """Return totals per event kind and unique sessions since ``since``"""
+    rows = _query(
+        "SELECT kind, COUNT(*), COUNT(DISTINCT session) FROM events "
+        "WHERE profile = ? AND ts >= ? GROUP BY kind",
+        (profile, since), path,
+    )
+    totals = {kind: count for kind, count, _ in rows}
+    sessions = _query(
+        "SELECT COUNT(DISTINCT session) FROM events WHERE profile = ? AND ts >= ?",
+        (profile, since), path,
+    )
+    return {
+        "page_views": totals.get(PAGE_VIEW, 0),
+        "nav_clicks": totals.get(NAV_CLICK, 0),
+        "outbound_clicks": totals.get(OUTBOUND_CLICK, 0),
+        "sessions": sessions[0][0] if sessions else 0,
+    }
+
+
+def counts_by(kind, column, since, limit=20, profile=content.DEFAULT_PROFILE, path=DB_PATH):
+    """Return ``[(value, count), ...]`` for one event kind grouped by ``column``"""
+    if column not in ("page", "target"):
+        raise ValueError(f"Cannot group by {column!r}")
+    return _query(
+        f"SELECT {column}, COUNT(*) AS n FROM events WHERE profile = ? AND kind = ? AND ts >= ? "
+        f"GROUP BY {column} ORDER BY n DESC LIMIT ?",
+        (profile, kind, since, limit), path,
+    )
+
+
+def daily_page_views(since, profile=content.DEFAULT_PROFILE, path=DB_PATH):
+    """Return ``[(day, count), ...]`` of page views per UTC day"""
+    return _query(
+        "SELECT date(ts, 'unixepoch') AS day, COUNT(*) FROM events "
+        "WHERE profile = ? AND kind = ? AND ts >= ? GROUP BY day ORDER BY day",
+        (profile, PAGE_VIEW, since), path,
+    )
@@ -0,0 +1,313 @@
+"""
+Read-only JSON API for the projects and papers.
+
+Other sites and dashboards can poll the content here rather than scraping
+the Streamlit UI, where every request costs a full script run. The server is
+a small ``http.server`` on a side port. It reads the same process caches as
+the pages::
+
+    GET /api/projects                      default profile
+    GET /api/<profile>/papers?fields=title,year&page=2&per_page=10
+    GET /api/<profile>/projects/<entry_id>
+
+Items carry the fields ``display_project`` / ``display_paper`` take, plus
+their ``id``. Local media paths are left out, and paper metrics include the
+stored citation counts (see :mod:`portfolio.bibliometrics`). ``fields``
+limits the fields returned, and ``page`` / ``per_page`` paginate lists.
+
+The same server answers ``GET /go?url=<url>&page=<page>&profile=<id>`` for
+outbound link clicks (see :mod:`portfolio.analytics`). It records the click
+and redirects with a ``302``, or answers ``400`` for URLs the site does not
+link to.
+
+A response is serialized (and gzipped) once per content version and query.
+The bytes are kept in a bounded LRU and served with a strong ``ETag``, so a
+client polling with ``If-None-Match`` gets a bodiless ``304`` until an entry
+changes.
+
+Usage::
+
+    python -m portfolio.api --port 8600
+    python -m portfolio.serve --api-port 8600 ...
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from portfolio import analytics, bibliometrics, cache, catalog, content, profiles, watcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8600
+PER_PAGE = 20
+MAX_PER_PAGE = 100
+MAX_RESPONSES = 512
+GZIP_MIN_SIZE = 1024
+
+FIELDS = {
+    "projects": [
+        "title", "tags", "description", "key_features", "technologies", "video_url", "links",
+    ],
+    "papers": [
+        "title", "authors", "publication", "year", "abstract", "tags", "highlights",
+        "methodologies", "pdf_url", "metrics", "citation", "links", "doi",
+    ],
+}
+
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+_versions = {}
+_server = None
+_server_lock = threading.Lock()
+
+
+class ApiError(Exception):
+    """Raised for a request that cannot be answered; carries the HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Response:
+    """A pre-serialized body with its strong ETag and optional gzip variant"""
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, default=catalog.to_python, ensure_ascii=False).encode("utf-8")
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.gzipped = None
+        if len(self.body) >= GZIP_MIN_SIZE:
+            self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+            self.gzip_etag = self.etag[:-1] + '-gz"'
+
+
+def content_version(kind, profile):
+    """
+    Return a version string that changes whenever an entry of ``kind`` does
+
+    Derived from the entry digests; ``content.refresh`` replaces the index
+    dict on every reload, so it is recomputed only after a change.
+    """
+    content.entries(kind, profile)
+    index = cache.records.peek((profile, kind), {})
+    cached = _versions.get((profile, kind))
+    if cached is None or cached[0] is not index:
+        digest = hashlib.sha1(json.dumps(list(index.items())).encode()).hexdigest()[:16]
+        cached = _versions[(profile, kind)] = (index, digest)
+    if kind == "papers":
+        return f"{cached[1]}-{bibliometrics.load_snapshot()['version']}"
+    return cached[1]
+
+
+def _parse_fields(kind, values):
+    if not values:
+        return tuple(FIELDS[kind])
+    requested = [name for value in values for name in value.split(",") if name]
+    unknown = sorted(set(requested) - set(FIELDS[kind]))
+    if unknown:
+        raise ApiError(400, f"unknown field(s) {', '.join(unknown)}; available: {', '.join(FIELDS[kind])}")
+    # Normalized so equivalent queries share one cached response
+    return tuple(name for name in FIELDS[kind] if name in requested)
+
+
+def _parse_int(query, name, default, maximum=None):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+    if value < 1:
+        if maximum is None:
+            raise ApiError(400, f"{name} must be a positive integer")
+        raise ApiError(400, f"{name} must be between 1 and {maximum}")
+    if maximum is not None and value > maximum:
+        raise ApiError(400, f"{name} must be between 1 and {maximum}")
+    return value
+
+
+def _item(entry_id, fields, names):
+    item = {"id": entry_id}
+    for name in names:
+        if name == "metrics":
+            metrics, _ = bibliometrics.paper_metrics(fields, fields.get("metrics"))
+            if metrics:
+                item[name] = metrics
+        elif name in fields:
+            item[name] = fields[name]
+    return item
+
+
+def build(profile, kind, entry_id, names, page, per_page):
+    """Return the payload for a request; runs only on a response cache miss"""
+    entries = content.entries(kind, profile)
+    if entry_id is not None:
+        for candidate, fields in entries:
+            if candidate == entry_id:
+                return _item(entry_id, fields, names)
+        raise ApiError(404, f"no {kind[:-1]} '{entry_id}'")
+    total = len(entries)
+    start = (page - 1) * per_page
+    return {
+        "profile": profile,
+        "kind": kind,
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "pages": max(1, -(-total // per_page)),
+        "items": [_item(entry_id, fields, names) for entry_id, fields in entries[start:start + per_page]],
+    }
+
+
+def respond(path, query):
+    """Resolve a request to a cached :class:`Response`; raises ApiError"""
+    parts = [unquote(part) for part in path.strip("/").split("/")]
+    if not parts or parts[0] != "api" or len(parts) < 2:
+        raise ApiError(404, "not found")
+    parts = parts[1:]
+    if parts[0] not in FIELDS:
+        profile, parts = parts[0], parts[1:]
+    else:
+        profile = content.DEFAULT_PROFILE
+    if not parts or parts[0] not in FIELDS or len(parts) > 2:
+        raise ApiError(404, "not found")
+    kind = parts[0]
+    entry_id = parts[1] if len(parts) == 2 else None
+
+    try:
+        profiles.activate(profile)
+    except content.UnknownProfile:
+        raise ApiError(404, f"no profile '{profile}'")
+    names = _parse_fields(kind, query.get("fields"))
+    page = _parse_int(query, "page", 1)
+    per_page = _parse_int(query, "per_page", PER_PAGE, MAX_PER_PAGE)
+
+    key = (profile, kind, content_version(kind, profile), entry_id, names, page, per_page)
+    with _responses_lock:
+        response = _responses.get(key)
+        if response is not None:
+            _responses.move_to_end(key)
+            return response
+    response = Response(build(profile, kind, entry_id, names, page, per_page))
+    with _responses_lock:
+        _responses[key] = response
+        while len(_responses) > MAX_RESPONSES:
+            _responses.popitem(last=False)
+    return response
+
+
+def _etag_matches(header, etag):
+    """Weak comparison, as If-None-Match requires"""
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "PortfolioAPI/1"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body):
+        url = urlsplit(self.path)
+        if url.path == "/go":
+            self._redirect(parse_qs(url.query), send_body)
+            return
+        try:
+            response = respond(url.path, parse_qs(url.query))
+        except ApiError as e:
+            self._send(e.status, json.dumps({"error": str(e)}).encode(), send_body=send_body)
+            return
+        except Exception:
+            logger.exception("API request failed: %s", self.path)
+            self._send(500, b'{"error": "internal error"}', send_body=send_body)
+            return
+
+        use_gzip = response.gzipped is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+        etag = response.gzip_etag if use_gzip else response.etag
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if _etag_matches(self.headers.get("If-None-Match"), etag):
+            self._send(304, b"", headers, send_body=False)
+            return
+        if use_gzip:
+            headers["Content-Encoding"] = "gzip"
+        self._send(200, response.gzipped if use_gzip else response.body, headers, send_body=send_body)
+
+    def _redirect(self, query, send_body):
+        target = query.get("url", [None])[0]
+        profile = query.get("profile", [content.DEFAULT_PROFILE])[0]
+        try:
+            known = analytics.follow_outbound(target, query.get("page", [None])[0], profile)
+        except content.UnknownProfile:
+            known = False
+        if not known:
+            self._send(400, b'{"error": "not a link on this site"}', send_body=send_body)
+            return
+        self.send_response(302)
+        self.send_header("Location", target)
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send(self, status, body, headers=None, send_body=True):
+        self.send_response(status)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", "ETag")
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body and status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+
+def ensure_started(port=DEFAULT_PORT, address="0.0.0.0"):
+    """Start the API server in a daemon thread once per process"""
+    global _server
+    # Content edits reach the API through the same watcher as the pages
+    watcher.ensure_started()
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((address, port), Handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="catalog-api", daemon=True).start()
+            logger.info("Catalog API listening on http://%s:%d/api/", address, port)
+    return _server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the projects and papers as JSON")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--address", default="0.0.0.0")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+    watcher.ensure_started()
+    server = ThreadingHTTPServer((args.address, args.port), Handler)
+    server.daemon_threads = True
+    logger.info("Catalog API listening on http://%s:%d/api/", args.address, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Citation metrics for the research page, refreshed offline.
+
+Citation counts come from a bibliographic source. That is either a dump of
+OpenAlex-style work records (JSON Lines, optionally gzipped) or a service
+with the OpenAlex ``/works/doi:<doi>`` API, e.g. a local stand-in or
+``https://api.openalex.org``. A scheduled job keeps them in a local SQLite
+store (``.cache/metrics.db``):
+
+* only DOIs whose source record changed are processed. Dump records are
+  compared by digest; the service is asked with ``If-None-Match`` and
+  answers ``304`` for unchanged works;
+* the per-profile aggregates (total citations, h-index, i10-index,
+  citations per year) are recomputed only for profiles with a changed DOI
+  or a changed paper list.
+
+Each refresh publishes the ready-to-display numbers to ``.cache/metrics.json``.
+Pages read that file, re-parsed only when it changes, so a rerun never
+queries or computes anything.
+
+Usage::
+
+    python -m portfolio.bibliometrics --dump works.jsonl.gz
+    python -m portfolio.bibliometrics --service http://localhost:8080 --every 86400
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+
+from portfolio import cache, content
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.path.join(content.CACHE_DIR, "metrics.db")
+SNAPSHOT_PATH = os.path.join(content.CACHE_DIR, "metrics.json")
+
+REQUEST_TIMEOUT = 20
+DOI_RE = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/|doi:)?(10\.\d{4,9}/\S+)$", re.I)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS works (
+    doi TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    etag TEXT,
+    citations INTEGER NOT NULL,
+    by_year TEXT NOT NULL,
+    refreshed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aggregates (
+    profile TEXT PRIMARY KEY,
+    dois TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    computed_at REAL NOT NULL
+);
+"""
+
+_snapshots = {}
+_snapshot_lock = threading.Lock()
+
+
+def connect(path=DB_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def normalize_doi(value):
+    """Return the bare, lower-case DOI in ``value`` (URL or ``doi:`` form), or None"""
+    match = DOI_RE.match((value or "").strip())
+    return match.group(1).lower() if match else None
+
+
+def paper_doi(fields):
+    """Return the DOI of a paper from its ``doi`` field or a doi.org link"""
+    doi = normalize_doi(fields.get("doi"))
+    if doi:
+        return doi
+    for url in (fields.get("links") or {}).values():
+        doi = normalize_doi(url)
+        if doi:
+            return doi
+    return None
+
+
+def collect_dois():
+    """Return ``{profile: [doi, ...]}`` for every profile's papers"""
+    result = {}
+    for profile in content.profile_ids():
+        dois = {paper_doi(entry) for entry in content.read_entries("papers", profile)}
+        result[profile] = sorted(doi for doi in dois if doi)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+def records_from_dump(path, wanted):
+    """Yield ``(doi, record)`` for the works in a JSON Lines dump that we list"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            doi = normalize_doi(record.get("doi"))
+            if doi in wanted:
+                yield doi, record
+
+
+def records_from_service(base_url, dois, etags):
+    """
+    Yield ``(doi, record, etag)`` for works the service reports as changed
+
+    Works answered with ``304 Not Modified`` (or missing) are skipped.
+    """
+    for doi in dois:
+        request = urllib.request.Request(
+            f"{base_url.rstrip('/')}/works/doi:{quote(doi, safe='/')}",
+            headers={"Accept": "application/json"},
+        )
+        if etags.get(doi):
+            request.add_header("If-None-Match", etags[doi])
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                record = json.load(response)
+                yield doi, record, response.headers.get("ETag")
+        except urllib.error.HTTPError as e:
+            if e.code not in (304, 404):
+                logger.warning("Metrics service error for %s: %s", doi, e)
+        except (OSError, ValueError) as e:
+            logger.warning("Metrics service unreachable for %s: %s", doi, e)
+
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def _counts(record):
+    citations = int(record.get("cited_by_count") or 0)
+    by_year = {
+        str(item["year"]): int(item.get("cited_by_count") or 0)
+        for item in record.get("counts_by_year") or []
+        if item.get("year")
+    }
+    return citations, by_year
+
+
+def store(conn, doi, record, etag=None):
+    """Write one work if its counts changed; returns True when it did"""
+    citations, by_year = _counts(record)
+    digest = _digest([citations, by_year])
+    row = conn.execute("SELECT digest FROM works WHERE doi = ?", (doi,)).fetchone()
+    if row is not None and row[0] == digest:
+        if etag:
+            conn.execute("UPDATE works SET etag = ? WHERE doi = ?", (etag, doi))
+        return False
+    conn.execute(
+        "INSERT OR REPLACE INTO works (doi, digest, etag, citations, by_year, refreshed_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (doi, digest, etag, citations, json.dumps(by_year, sort_keys=True), time.time()),
+    )
+    return True
+
+
+def h_index(citations):
+    """Largest h such that h papers have at least h citations each"""
+    ranked = sorted(citations, reverse=True)
+    return sum(1 for rank, count in enumerate(ranked, 1) if count >= rank)
+
+
+def aggregate(conn, dois):
+    """Return the portfolio-wide summary for a list of DOIs"""
+    rows = conn.execute(
+        f"SELECT citations, by_year FROM works WHERE doi IN ({','.join('?' * len(dois))})", dois
+    ).fetchall() if dois else []
+    citations = [count for count, _ in rows]
+    per_year = {}
+    for _, by_year in rows:
+        for year, count in json.loads(by_year).items():
+            per_year[year] = per_year.get(year, 0) + count
+    return {
+        "papers": len(dois),
+        "tracked": len(rows),
+        "total_citations": sum(citations),
+        "h_index": h_index(citations),
+        "i10_index": sum(1 for count in citations if count >= 10),
+        "citations_per_year": dict(sorted(per_year.items())),
+    }
+
+
+def paper_display(citations, by_year):
+    """The metrics shown on a paper card"""
+    metrics = {"Citations": citations}
+    if by_year:
+        latest = max(by_year)
+        metrics[f"Cited in {latest}"] = by_year[latest]
+    return metrics
+
+
+def publish(conn, path=SNAPSHOT_PATH):
+    """Write the display snapshot the pages read"""
+    papers = {
+        doi: paper_display(citations, json.loads(by_year))
+        for doi, citations, by_year in conn.execute("SELECT doi, citations, by_year FROM works")
+    }
+    profiles = {
+        profile: json.loads(summary)
+        for profile, summary in conn.execute("SELECT profile, summary FROM aggregates")
+    }
+    snapshot = {"version": int(time.time() * 1000), "papers": papers, "profiles": profiles}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, sort_keys=True)
+    os.replace(tmp_path, path)
+    return snapshot
+
+
+def refresh(dump=None, service=None, path=DB_PATH, snapshot_path=SNAPSHOT_PATH):
+    """
+    Update the store from a dump and/or a service and republish the snapshot
+
+    Returns ``{"changed": [doi, ...], "profiles": [profile, ...]}`` listing
+    the works that changed and the profiles whose aggregates were recomputed.
+    """
+    by_profile = collect_dois()
+    wanted = set().union(*by_profile.values()) if by_profile else set()
+    changed = set()
+    conn = connect(path)
+    try:
+        with conn:
+            if dump:
+                for doi, record in records_from_dump(dump, wanted):
+                    if store(conn, doi, record):
+                        changed.add(doi)
+            if service:
+                etags = dict(conn.execute("SELECT doi, etag FROM works WHERE etag IS NOT NULL"))
+                for doi, record, etag in records_from_service(service, sorted(wanted), etags):
+                    if store(conn, doi, record, etag):
+                        changed.add(doi)
+
+        recomputed = []
+        stored = dict(conn.execute("SELECT profile, dois FROM aggregates"))
+        with conn:
+            for profile, dois in by_profile.items():
+                dois_digest = _digest(dois)
+                if stored.get(profile) == dois_digest and not changed.intersection(dois):
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO aggregates (profile, dois, summary, computed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (profile, dois_digest, json.dumps(aggregate(conn, dois)), time.time()),
+                )
+                recomputed.append(profile)
+            # Profiles that no longer exist
+            conn.executemany(
+                "DELETE FROM aggregates WHERE profile = ?",
+                [(profile,) for profile in stored if profile not in by_profile],
+            )
+
+        if changed or recomputed or not os.path.exists(snapshot_path):
+            publish(conn, snapshot_path)
+    finally:
+        conn.close()
+    logger.info("Metrics refresh: %d work(s) changed, %d profile(s) recomputed", len(changed), len(recomputed))
+    return {"changed": sorted(changed), "profiles": recomputed}
+
+
+def start_scheduler(interval, dump=None, service=None):
+    """Run :func:`refresh` every ``interval`` seconds in a daemon thread"""
+    def loop():
+        while True:
+            try:
+                refresh(dump=dump, service=service)
+            except Exception:
+                logger.exception("Metrics refresh failed")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="metrics-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+# ---------------------------------------------------------------------------
+# Reading (render path)
+# ---------------------------------------------------------------------------
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """Return the published snapshot, re-reading the file only when it changed"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {"version": 0, "papers": {}, "profiles": {}}
+    with _snapshot_lock:
+        cached = _snapshots.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, encoding="utf-8") as f:
+                cached = _snapshots[path] = (mtime, json.load(f))
+            # Metric badges rendered from the previous snapshot are stale
+            cache.fragments.invalidate_where(lambda key: key[3].startswith("metrics"))
+        return cached[1]
+
+
+def paper_metrics(fields, extra=None):
+    """
+    Return the metrics to show for a paper: its own ``metrics`` plus the stored counts
+
+    Returns ``(metrics, fragment_name)``; the name changes with each snapshot
+    so cached badges are never reused across refreshes.
+    """
+    snapshot = load_snapshot()
+    metrics = dict(extra or {})
+    doi = paper_doi(fields)
+    if doi:
+        metrics.update(snapshot["papers"].get(doi, {}))
+    return metrics, f"metrics-{snapshot['version']}"
+
+
+def profile_summary(profile=content.DEFAULT_PROFILE):
+    """Return the precomputed aggregates for a profile, or None"""
+    return load_snapshot()["profiles"].get(profile)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the citation metrics store")
+    parser.add_argument("--dump", help="JSON Lines file of OpenAlex-style work records (.gz ok)")
+    parser.add_argument("--service", help="base URL of an OpenAlex-compatible /works API")
+    parser.add_argument("--every", type=int, default=0, help="repeat every N seconds instead of exiting")
+    args = parser.parse_args(argv)
+    if not args.dump and not args.service:
+        parser.error("give --dump and/or --service")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+    while True:
+        result = refresh(dump=args.dump, service=args.service)
+        print(f"Changed works: {', '.join(result['changed']) or 'none'}")
+        print(f"Recomputed profiles: {', '.join(result['profiles']) or 'none'}")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Process-wide caches shared by every Streamlit session.
+
+Streamlit's ``st.cache_data`` can only be cleared per function, so a single
+edited project would throw away every parsed entry and rendered fragment.
+These caches are keyed by tuples instead, which lets the content watcher drop
+exactly the entries that changed and lets profiles be evicted as a unit:
+
+* ``records``   - parsed content, keyed ``(profile, kind, entry_id)``
+* ``fragments`` - rendered HTML snippets, keyed ``(profile, kind, entry_id, name)``
+* ``images``    - resized images, keyed ``(profile, path, width)``
+
+Each cache keeps an estimate of its size in bytes so the profile manager can
+hold the process to a memory budget. Fragments are also shared between
+worker processes through :mod:`portfolio.diskcache` when it is enabled.
+"""
+import sys
+import threading
+
+from portfolio import diskcache
+
+
+def estimate_size(value):
+    """Rough size in bytes of a cached value (strings, containers, PIL images)"""
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if hasattr(value, "size") and hasattr(value, "mode"):
+        # PIL image: pixel buffer dominates
+        width, height = value.size
+        return width * height * len(value.getbands())
+    return sys.getsizeof(value)
+
+
+class Cache:
+    """A thread-safe dict with prefix-based invalidation and size accounting"""
+
+    def __init__(self, name):
+        self.name = name
+        self._data = {}
+        self._sizes = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Return the cached value for ``key``, calling ``build()`` on a miss
+
+        ``build`` runs outside the lock; if two sessions miss at once the
+        first stored value wins and both return it.
+        """
+        with self._lock:
+            if key in self._data:
+                return self._data[key]
+        value = build()
+        size = estimate_size(value)
+        with self._lock:
+            if key not in self._data:
+                self._store(key, value, size)
+            return self._data[key]
+
+    def _store(self, key, value, size):
+        self._total += size - self._sizes.get(key, 0)
+        self._data[key] = value
+        self._sizes[key] = size
+
+    def set(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            self._store(key, value, size)
+
+    def peek(self, key, default=None):
+        with self._lock:
+            return self._data.get(key, default)
+
+    def invalidate(self, *prefix):
+        """Drop every key that starts with ``prefix``; returns how many went"""
+        return self.invalidate_where(lambda key: key[:len(prefix)] == prefix)
+
+    def invalidate_where(self, predicate):
+        """Drop every key for which ``predicate(key)`` is true"""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+                self._total -= self._sizes.pop(key)
+        return len(stale)
+
+    def nbytes(self, predicate=None):
+        """Estimated size of the cached values, optionally of matching keys only"""
+        with self._lock:
+            if predicate is None:
+                return self._total
+            return sum(size for key, size in self._sizes.items() if predicate(key))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._total = 0
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+records = Cache("records")
+fragments = Cache("fragments")
+images = Cache("images")
+
+
+def fragment(profile, kind, entry_id, name, build):
+    """
+    Return a rendered fragment for a content entry, building it on a miss
+
+    Entries without an id (e.g. ad-hoc calls to ``display_project``) are
+    rendered every time rather than cached.
+    """
+    if entry_id is None:
+        return build()
+    return fragments.get(
+        (profile, kind, entry_id, name), lambda: _shared_fragment(profile, kind, entry_id, name, build)
+    )
+
+
+def _shared_fragment(profile, kind, entry_id, name, build):
+    # The entry digest keys the file, so an edited entry never reads a stale one
+    digest = records.peek((profile, kind), {}).get(entry_id)
+    if not diskcache.enabled() or digest is None:
+        return build()
+    return diskcache.get(
+        "fragments", (profile, kind, entry_id, name, digest), build, str.encode, bytes.decode
+    )
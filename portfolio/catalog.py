@@ -0,0 +1,388 @@
+"""
+Compiled, memory-mapped content catalog.
+
+Left alone, every app process parses the JSON content files and keeps its own
+copy of every entry. ``python -m portfolio.catalog`` compiles all profiles
+into one binary file instead. Processes ``mmap`` it read-only, so the catalog
+sits once in the OS page cache and every worker on the host shares it. Loading
+a profile then takes a few struct reads instead of a JSON parse.
+
+Layout (little-endian)::
+
+    header    magic, version, counts and region offsets
+    strings   (offset, length) per string, then one UTF-8 blob; each
+              distinct string is stored once
+    values    tagged values: null, bool, int, float, string reference,
+              list (offsets of its items), dict (key string, value offset)
+    sections  one per content file: profile, kind, the source file's
+              (mtime_ns, size), and where its entry table starts
+    entries   per section: entry id, content digest, record offset
+
+Records are :class:`LazyMap` / :class:`LazyList` views that decode a value
+only when it is read. A section is used only while its source file still has
+the recorded mtime and size. A file edited after compiling is read from JSON
+until the catalog is compiled again.
+"""
+import argparse
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Mapping, Sequence
+
+from portfolio import content
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.environ.get("PORTFOLIO_CATALOG", os.path.join(content.CACHE_DIR, "catalog.bin"))
+
+MAGIC = b"PCAT"
+# Bumped when the compiled records change meaning; older catalogs are ignored
+# (version 2: profile media paths are checked for containment)
+VERSION = 2
+
+# magic, version, string count, section count, strings/blob/values/sections offsets
+HEADER = struct.Struct("<4sH2xIIIIII")
+STRING = struct.Struct("<II")
+# profile, kind, source mtime_ns, source size, entry count, entry table offset
+SECTION = struct.Struct("<IIqqII")
+# entry id value, sha1 digest, record value
+ENTRY = struct.Struct("<I20sI")
+COUNT = struct.Struct("<I")
+PAIR = struct.Struct("<II")
+INT = struct.Struct("<q")
+FLOAT = struct.Struct("<d")
+
+NULL, FALSE, TRUE, INTEGER, REAL, TEXT, LIST, DICT = range(8)
+
+_catalog = None
+_catalog_key = None
+_catalog_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Compiling
+# ---------------------------------------------------------------------------
+
+class _Writer:
+    """Accumulates the string table and the value region"""
+
+    def __init__(self):
+        self.strings = {}
+        self.values = bytearray()
+
+    def string(self, text):
+        sid = self.strings.get(text)
+        if sid is None:
+            sid = self.strings[text] = len(self.strings)
+        return sid
+
+    def value(self, value):
+        """Append ``value`` and return its offset in the value region"""
+        # Children are written first so their offsets are known
+        if isinstance(value, (list, tuple)):
+            items = [self.value(item) for item in value]
+            offset = len(self.values)
+            self.values.append(LIST)
+            self.values += COUNT.pack(len(items))
+            for item in items:
+                self.values += COUNT.pack(item)
+            return offset
+        if isinstance(value, dict):
+            pairs = [(self.string(key), self.value(item)) for key, item in value.items()]
+            offset = len(self.values)
+            self.values.append(DICT)
+            self.values += COUNT.pack(len(pairs))
+            for pair in pairs:
+                self.values += PAIR.pack(*pair)
+            return offset
+
+        offset = len(self.values)
+        if value is None:
+            self.values.append(NULL)
+        elif value is True:
+            self.values.append(TRUE)
+        elif value is False:
+            self.values.append(FALSE)
+        elif isinstance(value, int):
+            self.values.append(INTEGER)
+            self.values += INT.pack(value)
+        elif isinstance(value, float):
+            self.values.append(REAL)
+            self.values += FLOAT.pack(value)
+        elif isinstance(value, str):
+            self.values.append(TEXT)
+            self.values += COUNT.pack(self.string(value))
+        else:
+            raise TypeError(f"cannot store {type(value).__name__} in the catalog")
+        return offset
+
+
+def compile_catalog(path=CATALOG_PATH):
+    """
+    Compile every profile's content files into a catalog at ``path``
+
+    The file is written next to ``path`` and renamed over it, so processes
+    that have the old catalog mapped keep reading a consistent file.
+
+    Returns a summary dict (sections, entries, strings, bytes).
+    """
+    writer = _Writer()
+    sections = []
+    for profile in content.profile_ids():
+        for kind in content.FILES:
+            source = content.content_path(kind, profile)
+            # Stat before reading: an edit in between leaves a stale stamp,
+            # which only makes readers fall back to the JSON file
+            try:
+                stat = os.stat(source)
+            except FileNotFoundError:
+                continue
+            rows = [
+                (writer.value(entry_id), bytes.fromhex(digest), writer.value(fields))
+                for entry_id, digest, fields in content.parse_entries(kind, profile)
+            ]
+            sections.append((
+                writer.string(profile), writer.string(kind), stat.st_mtime_ns, stat.st_size, rows,
+            ))
+
+    encoded = [text.encode("utf-8") for text in writer.strings]
+    strings_at = HEADER.size
+    blob_at = strings_at + STRING.size * len(encoded)
+    values_at = blob_at + sum(len(data) for data in encoded)
+    sections_at = values_at + len(writer.values)
+    entries_at = sections_at + SECTION.size * len(sections)
+
+    out = bytearray(HEADER.pack(
+        MAGIC, VERSION, len(encoded), len(sections), strings_at, blob_at, values_at, sections_at,
+    ))
+    position = 0
+    for data in encoded:
+        out += STRING.pack(position, len(data))
+        position += len(data)
+    for data in encoded:
+        out += data
+    out += writer.values
+    for profile, kind, mtime_ns, size, rows in sections:
+        out += SECTION.pack(profile, kind, mtime_ns, size, len(rows), entries_at)
+        entries_at += ENTRY.size * len(rows)
+    for *_, rows in sections:
+        for row in rows:
+            out += ENTRY.pack(*row)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(out)
+    os.replace(tmp_path, path)
+    return {
+        "sections": len(sections),
+        "entries": sum(len(rows) for *_, rows in sections),
+        "strings": len(encoded),
+        "bytes": len(out),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+class LazyList(Sequence):
+    """Read-only list view of a catalog value"""
+
+    __slots__ = ("_catalog", "_start", "_count")
+
+    def __init__(self, catalog, start, count):
+        self._catalog = catalog
+        self._start = start
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        (offset,) = COUNT.unpack_from(self._catalog.buffer, self._start + COUNT.size * index)
+        return self._catalog.value(offset)
+
+    def __repr__(self):
+        return f"LazyList({list(self)!r})"
+
+
+class LazyMap(Mapping):
+    """Read-only dict view of a catalog value; keys keep the source order"""
+
+    __slots__ = ("_catalog", "_start", "_count")
+
+    def __init__(self, catalog, start, count):
+        self._catalog = catalog
+        self._start = start
+        self._count = count
+
+    def _pairs(self):
+        buffer = self._catalog.buffer
+        for i in range(self._count):
+            yield PAIR.unpack_from(buffer, self._start + PAIR.size * i)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            wanted = key.encode("utf-8")
+            for sid, offset in self._pairs():
+                if self._catalog.string_equals(sid, wanted):
+                    return self._catalog.value(offset)
+        raise KeyError(key)
+
+    def __iter__(self):
+        for sid, _ in self._pairs():
+            yield self._catalog.string(sid)
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return f"LazyMap({dict(self)!r})"
+
+
+def to_python(value):
+    """Return a plain list/dict copy of a catalog value"""
+    if isinstance(value, Mapping):
+        return {key: to_python(item) for key, item in value.items()}
+    if isinstance(value, Sequence) and not isinstance(value, str):
+        return [to_python(item) for item in value]
+    return value
+
+
+class Catalog:
+    """
+    A compiled catalog mapped read-only into this process
+
+    Only the header and the section directory are read when opening; entries
+    are decoded on access.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self._n_strings, n_sections,
+         self._strings_at, self._blob_at, self._values_at, sections_at) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} catalog")
+        self.sections = {}
+        for i in range(n_sections):
+            profile, kind, mtime_ns, size, count, entries_at = SECTION.unpack_from(
+                self.buffer, sections_at + SECTION.size * i
+            )
+            self.sections[(self.string(profile), self.string(kind))] = (mtime_ns, size, count, entries_at)
+
+    def _string_span(self, sid):
+        offset, length = STRING.unpack_from(self.buffer, self._strings_at + STRING.size * sid)
+        start = self._blob_at + offset
+        return start, start + length
+
+    def string(self, sid):
+        start, end = self._string_span(sid)
+        return str(self.buffer[start:end], "utf-8")
+
+    def string_equals(self, sid, data):
+        start, end = self._string_span(sid)
+        return end - start == len(data) and self.buffer[start:end] == data
+
+    def value(self, offset):
+        position = self._values_at + offset
+        tag = self.buffer[position]
+        position += 1
+        if tag == NULL:
+            return None
+        if tag == TRUE:
+            return True
+        if tag == FALSE:
+            return False
+        if tag == INTEGER:
+            return INT.unpack_from(self.buffer, position)[0]
+        if tag == REAL:
+            return FLOAT.unpack_from(self.buffer, position)[0]
+        (number,) = COUNT.unpack_from(self.buffer, position)
+        if tag == TEXT:
+            return self.string(number)
+        if tag == LIST:
+            return LazyList(self, position + COUNT.size, number)
+        if tag == DICT:
+            return LazyMap(self, position + COUNT.size, number)
+        raise ValueError(f"corrupt catalog value at {offset}")
+
+    def entries(self, kind, profile, source):
+        """
+        Return ``[(entry_id, digest, record), ...]`` for a content file
+
+        Returns None when the catalog has no section for it or ``source`` has
+        changed since the catalog was compiled.
+        """
+        section = self.sections.get((profile, kind))
+        if section is None:
+            return None
+        mtime_ns, size, count, entries_at = section
+        try:
+            stat = os.stat(source)
+        except FileNotFoundError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+            return None
+        rows = []
+        for i in range(count):
+            entry_id, digest, offset = ENTRY.unpack_from(self.buffer, entries_at + ENTRY.size * i)
+            rows.append((self.value(entry_id), digest.hex(), self.value(offset)))
+        return rows
+
+
+def current(path=CATALOG_PATH):
+    """
+    Return the mapped catalog, reopening it after a recompile
+
+    Returns None when no catalog has been compiled. Records handed out from
+    a previous mapping keep it alive until they are dropped.
+    """
+    global _catalog, _catalog_key
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _catalog_lock:
+        if key != _catalog_key:
+            try:
+                _catalog = Catalog(path)
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning("Ignoring catalog %s: %s", path, e)
+                _catalog = None
+            _catalog_key = key
+        return _catalog
+
+
+def lookup(kind, profile=content.DEFAULT_PROFILE, path=CATALOG_PATH):
+    """Return the catalog rows for a content file, or None to read the JSON"""
+    catalog = current(path)
+    if catalog is None:
+        return None
+    return catalog.entries(kind, profile, content.content_path(kind, profile))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the content files into a binary catalog")
+    parser.add_argument("--output", default=CATALOG_PATH, help=f"catalog path (default: {CATALOG_PATH})")
+    args = parser.parse_args(argv)
+
+    summary = compile_catalog(args.output)
+    print(
+        f"Wrote {args.output}: {summary['entries']} entries in {summary['sections']} files, "
+        f"{summary['strings']} distinct strings, {summary['bytes']} bytes"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+Multi-worker deployment: several app processes behind a sticky balancer.
+
+Streamlit runs every session's script in a thread of one process, so
+CPU-bound reruns (image resizing, HTML assembly) share one GIL and one
+core. This launcher starts ``--workers`` copies of ``python -m
+portfolio.serve`` on consecutive local ports, with a small proxy in front
+on ``--port``.
+
+Sessions have to stay on one worker: the websocket, the session state and
+the media files it serves all live in that process. The proxy therefore
+pins each browser with a ``portfolio_worker`` cookie. It is set on the first
+response and carried by every later request, including the websocket
+upgrade, which is then piped through untouched. New browsers go to the
+worker with the fewest open connections. If a worker is down, its browsers
+are moved to another one.
+
+The content catalog is compiled once, the shared disk cache
+(:mod:`portfolio.diskcache`) is emptied, and crashed workers are restarted.
+Only the first worker runs the scheduled jobs (link checker, metrics
+refresh) and the JSON API.
+
+Usage::
+
+    python -m portfolio.cluster --workers 4 --port 8501
+    python -m portfolio.cluster --benchmark [--workers 8] [--seconds 5]
+
+``--benchmark`` runs the CPU-bound part of a cold rerun (photo resize,
+fragment rendering, page assembly) in N threads of one process and then in
+N processes, and prints the throughput of each. This is the scaling the
+launcher buys. All threads or processes start their timed loops together
+after a barrier, and only reruns finished inside that one window are
+counted against its wall time.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from portfolio import catalog, content
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_DIR = os.path.join(content.CACHE_DIR, "shared")
+COOKIE = "portfolio_worker"
+COOKIE_RE = re.compile(rb"^cookie:.*\b" + COOKIE.encode() + rb"=(\d+)", re.I | re.M)
+
+MAX_HEAD = 64 * 1024
+CHUNK = 64 * 1024
+RESTART_DELAY = 2
+STARTUP_TIMEOUT = 60
+
+BAD_GATEWAY = b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+class Worker:
+    """One app process and the number of client connections routed to it"""
+
+    def __init__(self, index, port, args):
+        self.index = index
+        self.port = port
+        self.args = args
+        self.process = None
+        self.active = 0
+
+    def start(self, env):
+        command = [
+            sys.executable, "-m", "portfolio.serve", "--no-catalog", *self.args,
+            "--server.port", str(self.port),
+            "--server.address", "127.0.0.1",
+            "--server.headless", "true",
+        ]
+        self.process = subprocess.Popen(command, env=env)
+        logger.info("Started worker %d on port %d (pid %d)", self.index, self.port, self.process.pid)
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.alive():
+            self.process.terminate()
+
+    def wait(self, timeout):
+        if self.process is None:
+            return
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+# ---------------------------------------------------------------------------
+# Balancer
+# ---------------------------------------------------------------------------
+
+def _pinned_worker(head):
+    match = COOKIE_RE.search(head)
+    return int(match.group(1)) if match else None
+
+
+def _set_cookie(head, index):
+    """Insert the sticky cookie into a response head"""
+    cookie = f"Set-Cookie: {COOKIE}={index}; Path=/; HttpOnly; SameSite=Lax\r\n".encode()
+    return head[:-2] + cookie + b"\r\n"
+
+
+async def _pipe(reader, writer):
+    while True:
+        data = await reader.read(CHUNK)
+        if not data:
+            break
+        writer.write(data)
+        await writer.drain()
+
+
+async def _pipe_response(reader, writer, cookie_index):
+    if cookie_index is not None:
+        head = await reader.readuntil(b"\r\n\r\n")
+        writer.write(_set_cookie(head, cookie_index))
+        await writer.drain()
+    await _pipe(reader, writer)
+
+
+class Balancer:
+    """Sticky-session TCP proxy that understands just enough HTTP"""
+
+    def __init__(self, workers):
+        self.workers = workers
+
+    def candidates(self, pinned):
+        """Workers to try in order: the pinned one, then the least busy"""
+        order = sorted((w for w in self.workers if w.alive()), key=lambda w: w.active)
+        if pinned is not None:
+            order.sort(key=lambda w: w.index != pinned)
+        return order
+
+    async def handle(self, client_reader, client_writer):
+        upstream_writer = None
+        worker = None
+        try:
+            try:
+                head = await client_reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            pinned = _pinned_worker(head)
+            for candidate in self.candidates(pinned):
+                try:
+                    upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", candidate.port)
+                except OSError:
+                    continue
+                worker = candidate
+                break
+            if worker is None:
+                client_writer.write(BAD_GATEWAY)
+                await client_writer.drain()
+                return
+
+            worker.active += 1
+            upstream_writer.write(head)
+            cookie_index = worker.index if worker.index != pinned else None
+            tasks = [
+                asyncio.ensure_future(_pipe(client_reader, upstream_writer)),
+                asyncio.ensure_future(_pipe_response(upstream_reader, client_writer, cookie_index)),
+            ]
+            # Either side closing ends the exchange (browsers never half-close)
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                if task.exception() is not None and not isinstance(
+                    task.exception(), (ConnectionError, asyncio.IncompleteReadError)
+                ):
+                    logger.warning("Proxy error on worker %d: %r", worker.index, task.exception())
+        finally:
+            if worker is not None:
+                worker.active -= 1
+            for writer in (upstream_writer, client_writer):
+                if writer is not None:
+                    writer.close()
+
+
+# ---------------------------------------------------------------------------
+# Launcher
+# ---------------------------------------------------------------------------
+
+def _healthy(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def wait_until_healthy(workers, timeout=STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    pending = list(workers)
+    while pending and time.monotonic() < deadline:
+        pending = [w for w in pending if not _healthy(w.port)]
+        if pending:
+            time.sleep(0.5)
+    if pending:
+        logger.warning("Workers not healthy after %ds: %s", timeout, [w.index for w in pending])
+
+
+async def supervise(workers, env, stop):
+    """Restart workers that exit until ``stop`` is set"""
+    while not stop.is_set():
+        for worker in workers:
+            if worker.process is not None and not worker.alive():
+                logger.warning("Worker %d exited with %s; restarting", worker.index, worker.process.returncode)
+                worker.start(env)
+        try:
+            await asyncio.wait_for(stop.wait(), RESTART_DELAY)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_balancer(workers, env, address, port):
+    balancer = Balancer(workers)
+    server = await asyncio.start_server(balancer.handle, address, port, limit=MAX_HEAD)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    logger.info("Balancing %d workers on http://%s:%d", len(workers), address, port)
+    async with server:
+        await supervise(workers, env, stop)
+
+
+def prepare_shared_cache(path=SHARED_CACHE_DIR):
+    """Empty the shared disk cache so no fragment from older code survives"""
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+
+def launch(workers, port, address, streamlit_args, first_worker_args=(), compile_catalog=True):
+    if compile_catalog:
+        logger.info("Compiled content catalog: %s", catalog.compile_catalog())
+    env = dict(os.environ, PORTFOLIO_SHARED_CACHE=prepare_shared_cache())
+
+    pool = []
+    for index in range(workers):
+        args = list(streamlit_args)
+        if index == 0:
+            # Scheduled jobs and the API run once per host
+            args = [*first_worker_args, *args]
+        pool.append(Worker(index, port + 1 + index, args))
+    try:
+        for worker in pool:
+            worker.start(env)
+        wait_until_healthy(pool)
+        asyncio.run(run_balancer(pool, env, address, port))
+    finally:
+        for worker in pool:
+            worker.stop()
+        for worker in pool:
+            worker.wait(10)
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def _cold_rerun():
+    """CPU-bound work of a rerun on cold caches: resize, fragments, page HTML"""
+    # Imported here so the balancer process does not load PIL and the pages
+    from portfolio import cache, export, fragments, images
+
+    cache.images.clear()
+    cache.fragments.clear()
+    photo = content.profile_info().get("photo")
+    if photo:
+        images.resized(photo, images.PROFILE_PHOTO_WIDTH)
+    for kind in content.FILES:
+        for entry_id, fields in content.entries(kind):
+            fragments.warm(content.DEFAULT_PROFILE, kind, entry_id, fields)
+    export.build_pages()
+
+
+def _run_until(start, stop, counter):
+    """Rerun from the shared start until ``stop`` is set; count finished reruns"""
+    start.wait()
+    done = 0
+    while True:
+        _cold_rerun()
+        # A rerun still in flight when the window closes does not count
+        if stop.is_set():
+            break
+        done += 1
+    counter.append(done)
+
+
+def _timed_window(start, stop, seconds):
+    """Release every worker at once, close the window after ``seconds``"""
+    start.wait()
+    began = time.perf_counter()
+    time.sleep(seconds)
+    stop.set()
+    return time.perf_counter() - began
+
+
+def _bench_threads(n, seconds):
+    counts = []
+    start, stop = threading.Barrier(n + 1), threading.Event()
+    threads = [threading.Thread(target=_run_until, args=(start, stop, counts)) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    window = _timed_window(start, stop, seconds)
+    for thread in threads:
+        thread.join()
+    return sum(counts) / window
+
+
+def _process_worker(start, stop, queue):
+    # Imports and first-use setup happen before the shared window opens
+    _cold_rerun()
+    counts = []
+    _run_until(start, stop, counts)
+    queue.put(counts[0])
+
+
+def _bench_processes(n, seconds):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    start, stop = context.Barrier(n + 1), context.Event()
+    processes = [context.Process(target=_process_worker, args=(start, stop, queue)) for _ in range(n)]
+    for process in processes:
+        process.start()
+    window = _timed_window(start, stop, seconds)
+    total = sum(queue.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total / window
+
+
+def benchmark(max_workers, seconds):
+    """Print reruns/s for 1..max_workers threads vs processes"""
+    _cold_rerun()
+    counts = [n for n in (1, 2, 4, 8, 16, 32) if n < max_workers] + [max_workers]
+    print(f"Cold rerun throughput, {seconds}s per run, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'threads/s':>12}{'procs/s':>12}{'speedup':>10}{'efficiency':>12}")
+    single = None
+    for n in counts:
+        threads = _bench_threads(n, seconds)
+        processes = _bench_processes(n, seconds)
+        single = single or processes
+        speedup = processes / single
+        print(f"{n:>8}{threads:>12.1f}{processes:>12.1f}{speedup:>9.2f}x{speedup / n:>11.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several app workers behind a sticky balancer")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of app processes")
+    parser.add_argument("--port", type=int, default=8501, help="public port; workers use the next ones")
+    parser.add_argument("--address", default="0.0.0.0", help="address the balancer listens on")
+    parser.add_argument("--link-check-interval", type=int, default=0, help="passed to the first worker")
+    parser.add_argument("--metrics-interval", type=int, default=0, help="passed to the first worker")
+    parser.add_argument("--metrics-source", help="passed to the first worker")
+    parser.add_argument("--api-port", type=int, default=0, help="passed to the first worker")
+    parser.add_argument("--no-catalog", action="store_true", help="do not compile the content catalog")
+    parser.add_argument("--benchmark", action="store_true", help="measure scaling instead of serving")
+    parser.add_argument("--seconds", type=float, default=5, help="duration of each benchmark run")
+    args, streamlit_args = parser.parse_known_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+
+    if args.benchmark:
+        benchmark(args.workers, args.seconds)
+        return
+    first_worker = []
+    if args.link_check_interval:
+        first_worker += ["--link-check-interval", str(args.link_check_interval)]
+    if args.metrics_interval:
+        first_worker += ["--metrics-interval", str(args.metrics_interval), "--metrics-source", args.metrics_source or ""]
+    if args.api_port:
+        first_worker += ["--api-port", str(args.api_port)]
+    launch(
+        args.workers, args.port, args.address, streamlit_args,
+        first_worker_args=first_worker, compile_catalog=not args.no_catalog,
+    )
+
+
+if __name__ == "__main__":
+    main()
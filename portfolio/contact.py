@@ -0,0 +1,292 @@
+"""
+Contact form delivery.
+
+Submissions are validated and inserted into a local SQLite queue
+(``.cache/contact.db``) during the submit rerun, which takes milliseconds.
+A background worker picks pending messages up in batches and delivers them
+over a single SMTP connection per batch. Failures are retried with
+exponential backoff (plus jitter) until ``MAX_ATTEMPTS`` is reached, after
+which the message is kept in the queue as ``failed`` for inspection.
+``python -m portfolio.serve`` starts the worker at launch, so messages left
+in the queue by a restart do not wait for the next visit to the home page.
+
+SMTP settings come from the environment:
+
+* ``CONTACT_SMTP_HOST`` / ``CONTACT_SMTP_PORT`` (default ``localhost:25``)
+* ``CONTACT_SMTP_USER`` / ``CONTACT_SMTP_PASSWORD`` (optional login)
+* ``CONTACT_SMTP_STARTTLS`` (``1`` to upgrade the connection)
+* ``CONTACT_FROM`` (envelope sender, default ``portfolio@localhost``)
+
+For local debugging any SMTP sink works, e.g.
+``python -m aiosmtpd -n -l localhost:1025`` with ``CONTACT_SMTP_PORT=1025``;
+``tests/test_contact.py`` has a minimal stand-in.
+"""
+import logging
+import os
+import random
+import re
+import smtplib
+import sqlite3
+import threading
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
+
+from portfolio import content
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.path.join(content.CACHE_DIR, "contact.db")
+
+BATCH_SIZE = 20
+POLL_INTERVAL = 5
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+# A claimed batch is hidden from other workers for this long
+LEASE = 5 * 60
+
+# Per-session token bucket: RATE_BURST messages, then one per RATE_REFILL seconds
+RATE_BURST = 3
+RATE_REFILL = 120
+
+MAX_NAME = 100
+MAX_MESSAGE = 5000
+MIN_MESSAGE = 10
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+# Control characters (CR/LF included) would end up in mail headers
+CONTROL_RE = re.compile(r"[\x00-\x1f\x7f]")
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    recipient TEXT NOT NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_due ON messages (status, next_attempt_at);
+"""
+
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+class ValidationError(ValueError):
+    """Raised when a submission is not acceptable; the message is user-facing"""
+
+
+def connect(path=DB_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def validate(name, email, message):
+    """Return cleaned ``(name, email, message)`` or raise ValidationError"""
+    name, email, message = name.strip(), email.strip(), message.strip()
+    if not name or len(name) > MAX_NAME or CONTROL_RE.search(name):
+        raise ValidationError(f"Please enter your name (up to {MAX_NAME} characters).")
+    if not EMAIL_RE.match(email) or len(email) > 254 or CONTROL_RE.search(email):
+        raise ValidationError("Please enter a valid email address.")
+    if len(message) < MIN_MESSAGE:
+        raise ValidationError(f"Your message should be at least {MIN_MESSAGE} characters.")
+    if len(message) > MAX_MESSAGE:
+        raise ValidationError(f"Your message should be at most {MAX_MESSAGE} characters.")
+    return name, email, message
+
+
+def enqueue(recipient, name, email, message, path=DB_PATH):
+    """
+    Validate a submission and store it for delivery
+
+    Parameters:
+    -----------
+    recipient : str
+        Address the message is delivered to
+    name, email, message : str
+        Form fields as entered by the visitor
+
+    Returns the queued message id. Raises ValidationError for bad input.
+    """
+    name, email, message = validate(name, email, message)
+    now = time.time()
+    conn = connect(path)
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO messages (created_at, recipient, name, email, body, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (now, recipient, name, email, message, now),
+            )
+    finally:
+        conn.close()
+    _wakeup.set()
+    return cursor.lastrowid
+
+
+def allow_submission(bucket, now=None):
+    """
+    Take a token from a per-session bucket; returns False when rate limited
+
+    ``bucket`` is a dict kept in the session (e.g. ``st.session_state``) and
+    is updated in place.
+    """
+    now = time.time() if now is None else now
+    tokens = bucket.get("tokens", RATE_BURST)
+    updated = bucket.get("updated", now)
+    tokens = min(RATE_BURST, tokens + (now - updated) / RATE_REFILL)
+    bucket["updated"] = now
+    if tokens < 1:
+        bucket["tokens"] = tokens
+        return False
+    bucket["tokens"] = tokens - 1
+    return True
+
+
+def smtp_settings():
+    return {
+        "host": os.environ.get("CONTACT_SMTP_HOST", "localhost"),
+        "port": int(os.environ.get("CONTACT_SMTP_PORT", "25")),
+        "user": os.environ.get("CONTACT_SMTP_USER"),
+        "password": os.environ.get("CONTACT_SMTP_PASSWORD"),
+        "starttls": os.environ.get("CONTACT_SMTP_STARTTLS") == "1",
+        "sender": os.environ.get("CONTACT_FROM", "portfolio@localhost"),
+    }
+
+
+def build_email(row, sender):
+    _, recipient, name, email, body = row
+    msg = EmailMessage()
+    msg["Subject"] = f"Portfolio contact from {name}"
+    msg["From"] = formataddr(("Portfolio contact form", sender))
+    msg["To"] = recipient
+    msg["Reply-To"] = formataddr((name, email))
+    msg.set_content(f"{name} <{email}> wrote:\n\n{body}\n")
+    return msg
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number ``attempts`` (1-based), with jitter"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _mark_failed(conn, message_id, attempts, error):
+    attempts += 1
+    status = FAILED if attempts >= MAX_ATTEMPTS else PENDING
+    conn.execute(
+        "UPDATE messages SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+        (status, attempts, time.time() + backoff(attempts), error, message_id),
+    )
+
+
+def deliver_due(path=DB_PATH, settings=None):
+    """
+    Deliver one batch of due messages; returns the number sent
+
+    The whole batch shares one SMTP connection. If the connection itself
+    fails, every message in the batch is rescheduled. The batch is claimed
+    in a write transaction first, so several worker processes sharing the
+    queue never send the same message twice.
+    """
+    settings = settings or smtp_settings()
+    conn = connect(path)
+    try:
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, attempts, recipient, name, email, body FROM messages "
+                "WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (PENDING, now, BATCH_SIZE),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE messages SET next_attempt_at = ? WHERE id = ?",
+                [(now + LEASE, row[0]) for row in rows],
+            )
+        if not rows:
+            return 0
+
+        sent = 0
+        handled = set()
+        try:
+            with smtplib.SMTP(settings["host"], settings["port"], timeout=30) as smtp:
+                if settings["starttls"]:
+                    smtp.starttls()
+                if settings["user"]:
+                    smtp.login(settings["user"], settings["password"])
+                for message_id, attempts, *fields in rows:
+                    try:
+                        email = build_email([message_id, *fields], settings["sender"])
+                    except Exception as e:
+                        # Cannot be sent as stored (e.g. a header the email
+                        # package refuses); retrying will not help either
+                        logger.warning("Contact message %d cannot be built: %r", message_id, e)
+                        with conn:
+                            _mark_failed(conn, message_id, MAX_ATTEMPTS - 1, repr(e))
+                        handled.add(message_id)
+                        continue
+                    try:
+                        smtp.send_message(email)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError,
+                            smtplib.SMTPSenderRefused) as e:
+                        # Rejected message; the rest of the batch can still go out
+                        with conn:
+                            _mark_failed(conn, message_id, attempts, repr(e))
+                    else:
+                        with conn:
+                            conn.execute("UPDATE messages SET status = ? WHERE id = ?", (SENT, message_id))
+                        sent += 1
+                    handled.add(message_id)
+        except (OSError, smtplib.SMTPException) as e:
+            logger.warning("SMTP delivery failed: %s", e)
+            with conn:
+                for message_id, attempts, *_ in rows:
+                    if message_id not in handled:
+                        _mark_failed(conn, message_id, attempts, repr(e))
+        return sent
+    finally:
+        conn.close()
+
+
+def _run():
+    while True:
+        _wakeup.clear()
+        try:
+            while deliver_due() == BATCH_SIZE:
+                pass
+        except Exception:
+            logger.exception("Contact delivery worker error")
+        _wakeup.wait(POLL_INTERVAL)
+
+
+def ensure_started():
+    """Start the delivery worker once per process"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run, name="contact-delivery", daemon=True)
+            _worker.start()
+    return _worker
+
+
+def queue_counts(path=DB_PATH):
+    """Return ``{status: count}`` for the debug/stats views"""
+    conn = connect(path)
+    try:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM messages GROUP BY status").fetchall())
+    finally:
+        conn.close()
@@ -0,0 +1,279 @@
+"""
+Loading of the portfolio content files.
+
+Each profile is a directory holding ``profile.json`` (name, intro, contact
+address, links, photo), ``projects.json`` and ``papers.json``. The default
+profile lives directly in ``content/``; further profiles live in
+``content/profiles/<profile_id>/`` and are selected with ``?profile=<id>``.
+
+Projects and papers are lists of entries, each with an ``id`` and the same
+fields ``display_project`` / ``display_paper`` take. Entries are parsed once
+per process and kept in ``cache.records`` under ``(profile, kind, entry_id)``;
+:func:`refresh` re-reads a file and reports which entries actually changed
+so only those are invalidated. When a compiled catalog is present (see
+:mod:`portfolio.catalog`) the records are lazy views into it rather than
+parsed copies.
+
+Media paths in a non-default profile (``image_path``, ``video_path``,
+``pdf_path``, ``gallery``, ``photo``) are relative to the profile directory
+and must stay inside it. Absolute paths and paths that resolve elsewhere are
+dropped with a warning, so a profile cannot publish other files (another
+tenant's media, the databases in ``.cache/``) through the media endpoints.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+from portfolio import cache
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTENT_DIR = os.path.join(ROOT, "content")
+PROFILES_DIR = os.path.join(CONTENT_DIR, "profiles")
+ASSETS_DIR = os.path.join(ROOT, "assets")
+# Runtime state (link check results, databases, disk caches); not committed
+CACHE_DIR = os.environ.get("PORTFOLIO_CACHE_DIR", os.path.join(ROOT, ".cache"))
+
+DEFAULT_PROFILE = os.environ.get("PORTFOLIO_DEFAULT_PROFILE", "default")
+PROFILE_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+FILES = {
+    "projects": "projects.json",
+    "papers": "papers.json",
+}
+PROFILE_FILE = "profile.json"
+
+_refresh_lock = threading.Lock()
+
+
+class UnknownProfile(LookupError):
+    """Raised for a profile id that is malformed or has no directory"""
+
+
+def profile_dir(profile=DEFAULT_PROFILE):
+    """Return the directory of a profile; raises UnknownProfile"""
+    if profile == DEFAULT_PROFILE:
+        return CONTENT_DIR
+    if not PROFILE_ID_RE.match(profile or ""):
+        raise UnknownProfile(profile)
+    path = os.path.join(PROFILES_DIR, profile)
+    if not os.path.isdir(path):
+        raise UnknownProfile(profile)
+    return path
+
+
+def profile_ids():
+    """Return every profile id, default first"""
+    ids = [DEFAULT_PROFILE]
+    if os.path.isdir(PROFILES_DIR):
+        ids += sorted(
+            name for name in os.listdir(PROFILES_DIR)
+            if PROFILE_ID_RE.match(name) and os.path.isdir(os.path.join(PROFILES_DIR, name))
+        )
+    return ids
+
+
+def content_path(kind, profile=DEFAULT_PROFILE):
+    return os.path.join(profile_dir(profile), FILES[kind])
+
+
+def _digest(entry):
+    return hashlib.sha1(json.dumps(entry, sort_keys=True).encode()).hexdigest()
+
+
+def read_entries(kind, profile=DEFAULT_PROFILE):
+    """
+    Read a content file without touching the caches
+
+    Batch jobs (link checks, exports) use this so that walking every profile
+    does not push the visited profiles out of the cache.
+    """
+    path = content_path(kind, profile)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    for entry in entries:
+        if "id" not in entry:
+            raise ValueError(f"{path}: every entry needs an 'id' ({entry.get('title')!r})")
+    return entries
+
+
+def contained_path(directory, path):
+    """
+    Return ``path`` joined to ``directory``, or None if it would leave it
+
+    Absolute paths and paths that resolve (through ``..`` or symlinks)
+    outside ``directory`` are refused.
+    """
+    if not isinstance(path, str) or os.path.isabs(path):
+        return None
+    joined = os.path.join(directory, path)
+    root = os.path.realpath(directory)
+    if os.path.commonpath([os.path.realpath(joined), root]) != root:
+        return None
+    return joined
+
+
+def _refuse(profile, key, path):
+    logger.warning("Profile %s: ignoring %s %r outside the profile directory", profile, key, path)
+
+
+def _resolve_paths(fields, profile):
+    """Make local media paths of non-default profiles relative to their directory"""
+    if profile == DEFAULT_PROFILE:
+        return fields
+    directory = profile_dir(profile)
+    for key in ("image_path", "video_path", "pdf_path"):
+        if fields.get(key):
+            path = contained_path(directory, fields[key])
+            if path is None:
+                _refuse(profile, key, fields.pop(key))
+            else:
+                fields[key] = path
+    if fields.get("gallery"):
+        gallery = []
+        for item in fields["gallery"]:
+            original = item if isinstance(item, str) else item.get("path")
+            path = contained_path(directory, original)
+            if path is None:
+                _refuse(profile, "gallery image", original)
+            else:
+                gallery.append(path if isinstance(item, str) else dict(item, path=path))
+        fields["gallery"] = gallery
+    return fields
+
+
+def parse_entries(kind, profile=DEFAULT_PROFILE):
+    """Return ``[(entry_id, digest, fields), ...]`` parsed from a content file"""
+    rows = []
+    for entry in read_entries(kind, profile):
+        fields = _resolve_paths(
+            {key: value for key, value in entry.items() if key != "id"}, profile
+        )
+        rows.append((entry["id"], _digest(fields), fields))
+    return rows
+
+
+def _load(kind, profile):
+    # Imported here because the catalog compiler reads through this module
+    from portfolio import catalog
+
+    rows = catalog.lookup(kind, profile)
+    return parse_entries(kind, profile) if rows is None else rows
+
+
+def _refresh(kind, profile):
+    """:func:`refresh`, also returning the new index and the loaded records"""
+    with _refresh_lock:
+        old_index = cache.records.peek((profile, kind), {})
+        new_index = {}
+        records = {}
+        changed = set()
+
+        for entry_id, digest, fields in _load(kind, profile):
+            new_index[entry_id] = digest
+            records[entry_id] = fields
+            if old_index.get(entry_id) != digest:
+                changed.add(entry_id)
+                cache.records.set((profile, kind, entry_id), fields)
+
+        for entry_id in set(old_index) - set(new_index):
+            changed.add(entry_id)
+            cache.records.invalidate(profile, kind, entry_id)
+
+        for entry_id in changed:
+            cache.fragments.invalidate(profile, kind, entry_id)
+
+        # The index is a dict so iteration keeps the file order
+        cache.records.set((profile, kind), new_index)
+        return changed, new_index, records
+
+
+def refresh(kind, profile=DEFAULT_PROFILE):
+    """
+    Re-read a content file and update the record cache in place
+
+    Returns the set of entry ids that were added, changed or removed. Rendered
+    fragments for those entries are dropped; everything else stays cached.
+    """
+    return _refresh(kind, profile)[0]
+
+
+def entries(kind, profile=DEFAULT_PROFILE):
+    """
+    Return ``[(entry_id, fields), ...]`` for a content kind in file order
+
+    The field dicts are shared between sessions and must not be mutated.
+    """
+    index = cache.records.peek((profile, kind))
+    loaded = {}
+    if index is None:
+        # Use what was just loaded: another session may evict the profile
+        # before the cache is read back
+        _, index, loaded = _refresh(kind, profile)
+    result = []
+    for entry_id in index:
+        fields = cache.records.peek((profile, kind, entry_id))
+        if fields is None:
+            fields = loaded.get(entry_id)
+        if fields is None:
+            # Raced with a refresh that removed the entry
+            continue
+        result.append((entry_id, fields))
+    return result
+
+
+def read_profile(profile=DEFAULT_PROFILE):
+    """Read ``profile.json`` without touching the caches (see :func:`read_entries`)"""
+    directory = profile_dir(profile)
+    with open(os.path.join(directory, PROFILE_FILE), encoding="utf-8") as f:
+        info = json.load(f)
+    # Photos are relative to the repository for the default profile and to
+    # the profile directory otherwise
+    if info.get("photo"):
+        if profile == DEFAULT_PROFILE:
+            info["photo"] = os.path.join(ROOT, info["photo"])
+        else:
+            photo = contained_path(directory, info["photo"])
+            if photo is None:
+                _refuse(profile, "photo", info.pop("photo"))
+            else:
+                info["photo"] = photo
+    return info
+
+
+def profile_info(profile=DEFAULT_PROFILE):
+    """Return the parsed ``profile.json`` of a profile"""
+    return cache.records.get((profile, "profile"), lambda: read_profile(profile))
+
+
+def loaded_profiles():
+    """Return the ids of profiles that currently have cached records"""
+    return {key[0] for key in cache.records.keys()}
+
+
+def locate(path):
+    """
+    Return ``(profile, kind)`` for a content file path, or None
+
+    ``kind`` is ``"profile"`` for ``profile.json``.
+    """
+    path = os.path.abspath(path)
+    directory, name = os.path.split(path)
+    if directory == CONTENT_DIR:
+        profile = DEFAULT_PROFILE
+    elif os.path.dirname(directory) == PROFILES_DIR:
+        profile = os.path.basename(directory)
+    else:
+        return None
+    if name == PROFILE_FILE:
+        return profile, "profile"
+    for kind, filename in FILES.items():
+        if name == filename:
+            return profile, kind
+    return None
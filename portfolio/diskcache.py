@@ -0,0 +1,104 @@
+"""
+On-disk cache shared by the worker processes of one host.
+
+The in-memory caches in :mod:`portfolio.cache` are per process, so with
+several workers each one would resize the same photos and render the same
+fragments. When ``PORTFOLIO_SHARED_CACHE`` names a directory (the
+multi-worker launcher sets it), those derivatives are also written there and
+the other workers read them instead of rebuilding.
+
+Every key includes a stamp of its inputs (the entry digest, the source
+image's mtime and size), so edited content never hits a stale file. A miss
+takes an exclusive ``flock`` on a per-key lock file. A worker that waited
+for the lock finds the value already written and reads it, so each value is
+built once per host. Values are written to a temporary file and renamed into
+place, which means readers never need the lock.
+
+The launcher empties the directory at start-up, so files rendered by older
+code are not served after a deploy.
+"""
+import hashlib
+import os
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): concurrent misses may both build
+    fcntl = None
+
+SHARED_DIR = os.environ.get("PORTFOLIO_SHARED_CACHE")
+
+
+def enabled():
+    return bool(SHARED_DIR)
+
+
+def _path(namespace, key):
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(SHARED_DIR, namespace, digest[:2], digest)
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def get(namespace, key, build, dump, load):
+    """
+    Return the value for ``key`` from the shared cache, building it on a miss
+
+    Parameters:
+    -----------
+    namespace : str
+        Subdirectory for this kind of value (e.g. ``"fragments"``)
+    key : tuple
+        Identifies the value; must include a stamp of everything it depends on
+    build : callable
+        Returns the value on a miss
+    dump, load : callable
+        Convert the value to bytes and back
+    """
+    path = _path(namespace, key)
+    data = _read(path)
+    if data is not None:
+        return load(data)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Another worker may have built it while we waited for the lock
+            data = _read(path)
+            if data is not None:
+                return load(data)
+            value = build()
+            _write(path, dump(value))
+            return value
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def nbytes():
+    """Total size of the cached files"""
+    total = 0
+    if not enabled():
+        return total
+    for dirpath, _, filenames in os.walk(SHARED_DIR):
+        for name in filenames:
+            if not name.endswith((".lock", ".tmp")):
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    pass
+    return total
@@ -0,0 +1,36 @@
+"""Helpers for turning video links into embeddable URLs."""
+
+
+# Function to extract a YouTube video ID
+def extract_youtube_id(url):
+    """Extract the YouTube video ID from various YouTube URL formats"""
+    if "youtube.com/shorts/" in url:
+        return url.split("youtube.com/shorts/")[1].split("?")[0].split("/")[0]
+    elif "youtube.com/watch?v=" in url:
+        return url.split("v=")[1].split("&")[0]
+    elif "youtube.com/embed/" in url:
+        return url.split("embed/")[1].split("?")[0]
+    elif "youtu.be/" in url:
+        return url.split("youtu.be/")[1].split("?")[0]
+    return None
+
+
+def embed_url(video_url):
+    """
+    Return an iframe-friendly URL for a YouTube or Vimeo link
+
+    Parameters:
+    -----------
+    video_url : str
+        URL to a YouTube or Vimeo video
+
+    Returns None when the URL is not from a supported provider.
+    """
+    if "youtube" in video_url.lower() or "youtu.be" in video_url.lower():
+        video_id = extract_youtube_id(video_url)
+        if video_id:
+            return f"https://www.youtube.com/embed/{video_id}"
+    elif "vimeo" in video_url.lower():
+        video_id = video_url.split("/")[-1]
+        return f"https://player.vimeo.com/video/{video_id}"
+    return None
@@ -0,0 +1,432 @@
+"""
+Static export of the portfolio for CDN hosting.
+
+Renders the home, projects and research pages to plain HTML from the page
+scripts and the content files, merges and minifies the CSS from each page's
+``local_css()`` block, and writes gzip and brotli siblings next to every text
+asset so the web server can hand out the precompressed files directly
+(``gzip_static`` / ``brotli_static`` in nginx).
+
+Usage::
+
+    python -m portfolio.export dist
+"""
+import argparse
+import ast
+import gzip
+import html
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:  # brotli is only needed at build time
+    brotli = None
+
+from portfolio import bibliometrics, content, images
+from portfolio.embed import embed_url
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = {
+    "index.html": "main.py",
+    "projects.html": os.path.join("pages", "projects.py"),
+    "research.html": os.path.join("pages", "research.py"),
+}
+
+TEXT_EXTENSIONS = (".html", ".css", ".js", ".svg", ".json", ".txt", ".xml")
+
+
+
+# ---------------------------------------------------------------------------
+# Reading the page scripts
+# ---------------------------------------------------------------------------
+
+def parse_page(path):
+    """Parse a page script without executing it (no Streamlit needed)"""
+    with open(os.path.join(ROOT, path), encoding="utf-8") as f:
+        return ast.parse(f.read(), filename=path)
+
+
+def _find_function(tree, name):
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == name:
+            return node
+    return None
+
+
+def _string_constants(node):
+    for child in ast.walk(node):
+        if isinstance(child, ast.Constant) and isinstance(child.value, str):
+            yield child.value
+
+
+def extract_css(tree):
+    """Return the stylesheet embedded in a page's ``local_css()`` function"""
+    func = _find_function(tree, "local_css")
+    if func is None:
+        return ""
+    for value in _string_constants(func):
+        match = re.search(r"<style>(.*?)</style>", value, re.S)
+        if match:
+            return match.group(1)
+    return ""
+
+
+# ---------------------------------------------------------------------------
+# Minification
+# ---------------------------------------------------------------------------
+
+def _split_rules(css):
+    """Split a stylesheet into top-level rules, keeping @media blocks whole"""
+    rules, depth, start = [], 0, 0
+    for i, char in enumerate(css):
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                rules.append(css[start:i + 1].strip())
+                start = i + 1
+    return [rule for rule in rules if rule]
+
+
+def minify_css(css):
+    """Strip comments and whitespace from a stylesheet"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+
+def merge_css(stylesheets):
+    """
+    Merge several stylesheets into one minified sheet
+
+    Rules repeated verbatim across the pages are kept only at their last
+    occurrence, which leaves the cascade unchanged.
+    """
+    rules = []
+    for css in stylesheets:
+        rules.extend(_split_rules(minify_css(css)))
+    last_index = {rule: i for i, rule in enumerate(rules)}
+    return "".join(rule for i, rule in enumerate(rules) if last_index[rule] == i)
+
+
+def minify_html(markup):
+    """Collapse whitespace between and inside tags, leaving <pre> untouched"""
+    parts = re.split(r"(<pre\b.*?</pre>)", markup, flags=re.S | re.I)
+    for i in range(0, len(parts), 2):
+        part = re.sub(r"<!--(?!\[).*?-->", "", parts[i], flags=re.S)
+        part = re.sub(r"\s+", " ", part)
+        part = re.sub(r">\s+<", "><", part)
+        parts[i] = part
+    return "".join(parts).strip()
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+def _inline_markdown(text):
+    """Render the small markdown subset used by the pages ([links], **bold**)"""
+    text = html.escape(text.strip(), quote=False)
+    text = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", text)
+    return re.sub(r"\[([^\]]+)\]\(([^)]+)\)", r'<a href="\2">\1</a>', text)
+
+
+def _paragraph(text):
+    return f"<p>{_inline_markdown(' '.join(text.split()))}</p>"
+
+
+def _list_html(items):
+    return "<ul>" + "".join(f"<li>{item}</li>" for item in items) + "</ul>"
+
+
+def _list(items):
+    return _list_html(_inline_markdown(item) for item in items)
+
+
+def _tags(tags):
+    return " ".join(f'<span class="tag">{html.escape(tag)}</span>' for tag in tags)
+
+
+def _links(links):
+    if not links:
+        return ""
+    items = [f'<a href="{html.escape(url)}">{html.escape(label)}</a>' for label, url in links.items()]
+    return "<h3>Links</h3>" + _list_html(items)
+
+
+def _iframe(src):
+    return (
+        '<div class="embed"><iframe src="' + html.escape(src) + '" frameborder="0" '
+        'allowfullscreen loading="lazy"></iframe></div>'
+    )
+
+
+def render_project(project):
+    media = ""
+    if project.get("video_url") and embed_url(project["video_url"]):
+        media = _iframe(embed_url(project["video_url"]))
+    return f"""
+    <section class="project-container">
+        <h2 class="project-title">{html.escape(project["title"])}</h2>
+        <div>{_tags(project["tags"])}</div>
+        <div class="columns">
+            <div class="col-main">
+                <h3>Description</h3>
+                {_paragraph(project["description"])}
+                <h3>Key Features</h3>
+                {_list(project["key_features"])}
+                <h3>Technologies Used</h3>
+                {_list(project["technologies"])}
+            </div>
+            <div class="col-side">
+                {media}
+                {_links(project.get("links"))}
+            </div>
+        </div>
+    </section>
+    """
+
+
+def render_paper(paper):
+    links = dict(paper.get("links") or {})
+    if paper.get("pdf_url"):
+        links = {"View Full Paper": paper["pdf_url"], **links}
+    values, _ = bibliometrics.paper_metrics(paper, paper.get("metrics"))
+    metrics = ""
+    if values:
+        metrics = '<div class="metrics-container">' + "".join(
+            f'<div class="metric-item"><span class="metric-label">{html.escape(str(label))}:</span>'
+            f"<span>{html.escape(str(value))}</span></div>"
+            for label, value in values.items()
+        ) + "</div>"
+    sections = ["<h3>Abstract</h3>", _paragraph(paper["abstract"])]
+    if paper.get("highlights"):
+        sections += ["<h3>Key Findings</h3>", _list(paper["highlights"])]
+    if paper.get("methodologies"):
+        sections += ["<h3>Methodologies</h3>", _list(paper["methodologies"])]
+    if paper.get("citation"):
+        sections += ["<h3>Citation</h3>", f'<pre class="citation-box">{html.escape(paper["citation"].strip())}</pre>']
+    return f"""
+    <section class="paper-container">
+        <h2 class="paper-title">{html.escape(paper["title"])}</h2>
+        <p><strong>Authors:</strong> {html.escape(", ".join(paper["authors"]))}</p>
+        <p><strong>Published in:</strong> {html.escape(paper["publication"])}, {paper["year"]}</p>
+        {metrics}
+        <div>{_tags(paper["tags"])}</div>
+        <div class="columns">
+            <div class="col-main">{"".join(sections)}</div>
+            <div class="col-side">{_links(links)}</div>
+        </div>
+    </section>
+    """
+
+
+def render_home(info):
+    email = info.get("email", "")
+    photo = os.path.basename(info.get("photo") or "photo.jpg")
+    return f"""
+    <div class="intro-section columns">
+        <div class="image-container col-photo">
+            <img src="assets/{html.escape(photo)}" alt="Profile photo" width="{images.PROFILE_PHOTO_WIDTH}">
+        </div>
+        <div class="text-container col-main">
+            <div class="profile-header">
+                <div class="profile-title">{info.get("greeting", "")}</div>
+                <div class="profile-intro">{info.get("intro", "")}</div>
+            </div>
+        </div>
+    </div>
+    <hr>
+    <div class="columns">
+        <div class="col-half">
+            <h3>Contact Information</h3>
+            <p>📧 <a href="mailto:{html.escape(email)}">{html.escape(email)}</a></p>
+        </div>
+        <div class="col-half">
+            <h3>Links</h3>
+            {_list(f"[{label}]({url})" for label, url in info.get("links", {}).items())}
+        </div>
+    </div>
+    """
+
+
+# Layout rules replacing what Streamlit's columns/iframes provide in the app
+LAYOUT_CSS = """
+body { margin: 0; font-family: sans-serif; }
+.main { max-width: 1200px; margin: 0 auto; }
+nav a { color: white; margin-right: 1.5rem; text-decoration: none; }
+a { color: #4d9fff; }
+hr { border: 0; border-top: 1px solid #333; margin: 2rem 0; }
+.columns { display: flex; flex-wrap: wrap; gap: 2rem; }
+.col-main { flex: 2 1 400px; }
+.col-side, .col-photo { flex: 1 1 280px; }
+.col-half { flex: 1 1 300px; }
+.embed { position: relative; padding-bottom: 56.25%; height: 0; overflow: hidden; background: #000; }
+.embed iframe { position: absolute; top: 0; left: 0; width: 100%; height: 100%; }
+"""
+
+
+def render_document(title, body):
+    return f"""<!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="utf-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1">
+        <title>{html.escape(title)}</title>
+        <link rel="stylesheet" href="assets/site.css">
+    </head>
+    <body>
+        <div class="main">
+            <nav>
+                <a href="index.html">Home</a>
+                <a href="projects.html">Projects</a>
+                <a href="research.html">Researches</a>
+            </nav>
+            {body}
+        </div>
+    </body>
+    </html>
+    """
+
+
+def build_pages():
+    """Return ``{filename: html}`` for every exported page"""
+    info = content.profile_info()
+    projects = [project for _, project in content.entries("projects")]
+    papers = [paper for _, paper in content.entries("papers")]
+    return {
+        "index.html": render_document("My Portfolio", render_home(info)),
+        "projects.html": render_document(
+            "Projects | My Portfolio",
+            "<h1>My Projects</h1>" + "<hr>".join(render_project(p) for p in projects),
+        ),
+        "research.html": render_document(
+            "Researches | My Portfolio",
+            "<h1>Researches</h1>" + "<hr>".join(render_paper(p) for p in papers),
+        ),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Writing and compressing
+# ---------------------------------------------------------------------------
+
+def write_photo(out_dir):
+    """Write the profile photo at the width the home page displays it"""
+    photo = content.profile_info().get("photo")
+    if not photo:
+        return
+    resized = images.resized(photo, images.PROFILE_PHOTO_WIDTH)
+    target = os.path.join(out_dir, "assets", os.path.basename(photo))
+    resized.convert("RGB").save(target, "JPEG", quality=85, optimize=True, progressive=True)
+
+
+def compress_file(path):
+    """
+    Write ``path.gz`` and ``path.br`` next to ``path`` at maximum compression
+
+    Returns a dict of sizes in bytes for the size report.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    sizes = {"raw": len(data)}
+
+    # mtime=0 keeps the output byte-identical between builds
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    with open(path + ".gz", "wb") as f:
+        f.write(gz)
+    sizes["gzip"] = len(gz)
+
+    if brotli is not None:
+        br = brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+        with open(path + ".br", "wb") as f:
+            f.write(br)
+        sizes["brotli"] = len(br)
+    return sizes
+
+
+def compress_tree(out_dir, workers=None):
+    """Compress every text asset under ``out_dir`` in parallel"""
+    paths = []
+    for dirpath, _, filenames in os.walk(out_dir):
+        for name in filenames:
+            if name.endswith(TEXT_EXTENSIONS):
+                paths.append(os.path.join(dirpath, name))
+    # zlib and brotli release the GIL while compressing, so threads suffice
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(compress_file, paths)
+    return {os.path.relpath(path, out_dir): sizes for path, sizes in zip(paths, results)}
+
+
+def _format_report(rows):
+    header = f"{'asset':<24}{'source':>10}{'minified':>10}{'gzip':>10}{'brotli':>10}"
+    lines = [header, "-" * len(header)]
+    for name, sizes in rows:
+        lines.append(
+            f"{name:<24}{sizes.get('source', '-'):>10}{sizes['raw']:>10}"
+            f"{sizes['gzip']:>10}{sizes.get('brotli', '-'):>10}"
+        )
+    return "\n".join(lines)
+
+
+def export(out_dir, workers=None):
+    """
+    Export the static site to ``out_dir``
+
+    Parameters:
+    -----------
+    out_dir : str
+        Output directory; it is recreated on every run
+    workers : int, optional
+        Number of compression threads (defaults to the executor's choice)
+
+    Returns the size report as a list of ``(asset, sizes)`` tuples.
+    """
+    trees = {name: parse_page(path) for name, path in PAGES.items()}
+
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(os.path.join(out_dir, "assets"))
+
+    source_sizes = {}
+    css_sources = [extract_css(tree) for tree in trees.values()]
+    css = merge_css([LAYOUT_CSS] + css_sources)
+    source_sizes[os.path.join("assets", "site.css")] = sum(len(s.encode()) for s in css_sources + [LAYOUT_CSS])
+    with open(os.path.join(out_dir, "assets", "site.css"), "w", encoding="utf-8") as f:
+        f.write(css)
+
+    for name, markup in build_pages().items():
+        source_sizes[name] = len(markup.encode())
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+            f.write(minify_html(markup))
+
+    write_photo(out_dir)
+
+    report = compress_tree(out_dir, workers)
+    for name, sizes in report.items():
+        sizes["source"] = source_sizes.get(name, sizes["raw"])
+    return sorted(report.items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir", nargs="?", default="dist", help="output directory (default: dist)")
+    parser.add_argument("--workers", type=int, default=None, help="compression threads")
+    args = parser.parse_args(argv)
+
+    if brotli is None:
+        print("brotli is not installed; skipping .br files (pip install brotli)", file=sys.stderr)
+    report = export(args.out_dir, args.workers)
+    print(_format_report(report))
+
+
+if __name__ == "__main__":
+    main()
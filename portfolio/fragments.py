@@ -0,0 +1,79 @@
+"""
+Builders for the HTML/markdown fragments of project and paper cards.
+
+The pages cache these per entry through ``cache.fragment``; keeping the
+builders here (rather than in the page scripts) lets the warm-up stage
+render them without a Streamlit session. Links go through
+``analytics.outbound_href`` so clicks are counted.
+"""
+from portfolio import analytics, bibliometrics, cache, content
+
+
+def tags_html(tags):
+    """Render a list of tags as pill badges"""
+    return " ".join([f'<span class="tag">{tag}</span>' for tag in tags])
+
+
+def project_links_markdown(links, profile=content.DEFAULT_PROFILE):
+    """Render a project's dict of link labels and URLs as markdown lines with icons"""
+    lines = []
+    for label, url in links.items():
+        # Choose icon based on common link types
+        icon = "🔗"  # Default icon
+        if "github" in url.lower():
+            icon = "🔗"
+        elif "demo" in label.lower() or "live" in label.lower():
+            icon = "🌐"
+        elif "case" in label.lower() or "study" in label.lower() or "doc" in label.lower():
+            icon = "📄"
+        elif "result" in label.lower() or "analysis" in label.lower():
+            icon = "📊"
+
+        lines.append(f"[{icon} {label}]({analytics.outbound_href(url, profile, 'projects')})")
+    return "  \n".join(lines)
+
+
+def paper_links_markdown(links, profile=content.DEFAULT_PROFILE):
+    """Render a paper's dict of link labels and URLs as markdown lines with icons"""
+    lines = []
+    for label, url in links.items():
+        # Choose icon based on common link types
+        icon = "🔗"  # Default icon
+        if "doi" in label.lower():
+            icon = "🔍"
+        elif "code" in label.lower() or "github" in url.lower():
+            icon = "💻"
+        elif "dataset" in label.lower():
+            icon = "📊"
+        elif "video" in label.lower() or "presentation" in label.lower():
+            icon = "🎬"
+
+        lines.append(f"[{icon} {label}]({analytics.outbound_href(url, profile, 'research')})")
+    return "  \n".join(lines)
+
+
+def metrics_html(metrics):
+    """Render a dict of metrics as a row of metric badges"""
+    metric_html = '<div class="metrics-container">'
+    for label, value in metrics.items():
+        metric_html += f"""
+        <div class="metric-item">
+            <span class="metric-label">{label}:</span>
+            <span>{value}</span>
+        </div>
+        """
+    metric_html += '</div>'
+    return metric_html
+
+
+def warm(profile, kind, entry_id, fields):
+    """Build and cache every fragment the card for this entry will ask for"""
+    cache.fragment(profile, kind, entry_id, "tags", lambda: tags_html(fields["tags"]))
+    links = fields.get("links")
+    if links:
+        build = project_links_markdown if kind == "projects" else paper_links_markdown
+        cache.fragment(profile, kind, entry_id, "links", lambda: build(links, profile))
+    if kind == "papers":
+        metrics, name = bibliometrics.paper_metrics(fields, fields.get("metrics"))
+        if metrics:
+            cache.fragment(profile, kind, entry_id, name, lambda: metrics_html(metrics))
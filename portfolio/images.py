@@ -0,0 +1,66 @@
+"""
+Cached image loading and resizing.
+
+Resized derivatives are kept in ``cache.images`` keyed by
+``(profile, path, width)`` so the photo on the home page is decoded and
+resampled once per process instead of on every rerun, and evicting a
+profile releases its images. Only the derivative is cached: the original is
+decoded at reduced scale where the format allows it (JPEG draft mode) and
+dropped right after resampling, so a 12 MP photo does not sit in the
+budgeted cache next to its 300px copy. With :mod:`portfolio.diskcache` enabled, resized
+derivatives are resampled once per host and shared between workers as PNG.
+"""
+import io
+import os
+
+from PIL import Image
+
+from portfolio import cache, diskcache
+from portfolio.content import DEFAULT_PROFILE
+
+# The home page shows the profile photo at this width
+PROFILE_PHOTO_WIDTH = 300
+
+
+def _key_path(path):
+    return os.path.abspath(path)
+
+
+def _to_png(img):
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _from_png(data):
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        return img.copy()
+
+
+def resized(path, width, profile=DEFAULT_PROFILE):
+    """Return the image at ``path`` resized to ``width``, keeping aspect ratio"""
+    path = _key_path(path)
+
+    def resize():
+        with Image.open(path) as img:
+            new_height = int((width / img.width) * img.height)
+            # Let the JPEG decoder downscale by up to 8x while decoding
+            img.draft(img.mode, (width, new_height))
+            return img.resize((width, new_height), Image.LANCZOS)
+
+    def build():
+        if not diskcache.enabled():
+            return resize()
+        stat = os.stat(path)
+        return diskcache.get(
+            "images", (path, stat.st_mtime_ns, stat.st_size, width), resize, _to_png, _from_png
+        )
+
+    return cache.images.get((profile, path, width), build)
+
+
+def invalidate(path):
+    """Drop every derivative of ``path``, in every profile"""
+    path = _key_path(path)
+    return cache.images.invalidate_where(lambda key: key[1] == path)
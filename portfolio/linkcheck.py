@@ -0,0 +1,347 @@
+"""
+Scheduled checking of every outbound link in the content files.
+
+Project/paper ``links``, ``video_url`` and ``pdf_url`` values are fetched
+concurrently with asyncio over a bounded number of connections (overall and
+per host). For each URL the status code, the final URL after redirects and
+the page ``<title>`` are stored in ``.cache/links.json`` with the time of the
+check; results younger than the TTL are not fetched again.
+
+The checker never runs in the render path. Start it on a schedule with::
+
+    python -m portfolio.linkcheck --every 21600
+
+or let ``python -m portfolio.serve --link-check-interval 21600`` run it in a
+background thread. Pages only read the stored results through
+:func:`is_broken`.
+
+Pre-signed S3 URLs (``X-Amz-Date`` + ``X-Amz-Expires``) are recognised and
+reported as expired without a request.
+
+Only definitive results make a link broken: 404/410, an expired pre-signed
+URL, or ``MAX_FAILURES`` failed checks in a row. A single timeout, TLS error
+or 5xx on the checker host is recorded but does not hide anything.
+"""
+import argparse
+import asyncio
+import html
+import json
+import logging
+import os
+import re
+import ssl
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+from portfolio import content
+
+logger = logging.getLogger(__name__)
+
+RESULTS_PATH = os.path.join(content.CACHE_DIR, "links.json")
+
+DEFAULT_TTL = 24 * 60 * 60
+# Failed checks are retried sooner than successful ones
+ERROR_TTL = 60 * 60
+MAX_CONNECTIONS = 8
+MAX_PER_HOST = 2
+TIMEOUT = 10
+MAX_REDIRECTS = 5
+# Enough to find <title> in any sane page without downloading it whole
+MAX_BODY = 64 * 1024
+USER_AGENT = "portfolio-linkcheck/1.0"
+
+# Status codes that mean the link is gone rather than "not for robots"
+BROKEN_STATUSES = {404, 410}
+# Consecutive transient failures (errors, 5xx) before a link counts as broken
+MAX_FAILURES = 3
+
+# path -> (mtime_ns, results); the render path re-reads only on change
+_results = {}
+_results_lock = threading.Lock()
+
+
+# Function to collect every outbound link from the content files
+def collect_links():
+    """Return the sorted list of outbound URLs referenced by every profile"""
+    urls = set()
+    for profile in content.profile_ids():
+        for kind in content.FILES:
+            for fields in content.read_entries(kind, profile):
+                for key in ("video_url", "pdf_url"):
+                    if fields.get(key):
+                        urls.add(fields[key])
+                urls.update((fields.get("links") or {}).values())
+    return sorted(url for url in urls if url.startswith(("http://", "https://")))
+
+
+def presigned_expiry(url):
+    """Return the expiry time of a pre-signed S3 URL, or None for other URLs"""
+    query = parse_qs(urlsplit(url).query)
+    try:
+        signed_at = datetime.strptime(query["X-Amz-Date"][0], "%Y%m%dT%H%M%SZ")
+        expires = int(query["X-Amz-Expires"][0])
+    except (KeyError, ValueError):
+        return None
+    return signed_at.replace(tzinfo=timezone.utc) + timedelta(seconds=expires)
+
+
+async def _read_body(reader, headers):
+    """Read at most MAX_BODY bytes of the body, undoing chunked encoding"""
+    if headers.get("transfer-encoding", "").lower() != "chunked":
+        return await reader.read(MAX_BODY)
+    body = b""
+    while len(body) < MAX_BODY:
+        size_line = await reader.readline()
+        size = int(size_line.split(b";")[0].strip() or b"0", 16)
+        if size == 0:
+            break
+        body += await reader.readexactly(size)
+        await reader.readline()
+    return body
+
+
+async def _request(url, timeout):
+    """Issue one GET and return ``(status, headers, body)``"""
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    ssl_context = ssl.create_default_context() if secure else None
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=ssl_context), timeout
+    )
+    try:
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        host = parts.netloc.rsplit("@", 1)[-1]
+        writer.write(
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            f"User-Agent: {USER_AGENT}\r\n"
+            "Accept: text/html,application/xhtml+xml,*/*;q=0.8\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        body = b""
+        if status == 200 and "html" in headers.get("content-type", ""):
+            body = await asyncio.wait_for(_read_body(reader, headers), timeout)
+        return status, headers, body
+    finally:
+        writer.close()
+
+
+def _title(body):
+    match = re.search(rb"<title[^>]*>(.*?)</title>", body, re.S | re.I)
+    if not match:
+        return None
+    return html.unescape(" ".join(match.group(1).decode("utf-8", "replace").split())) or None
+
+
+async def check_url(url, host_limits, connections, timeout=TIMEOUT):
+    """
+    Check a single URL, following redirects
+
+    Returns a result dict with ``status``, ``final_url``, ``title``, ``error``
+    and ``checked_at``.
+    """
+    result = {"status": None, "final_url": url, "title": None, "error": None, "checked_at": time.time()}
+
+    expiry = presigned_expiry(url)
+    if expiry is not None and expiry < datetime.now(timezone.utc):
+        result["error"] = f"pre-signed URL expired at {expiry.isoformat()}"
+        result["expired"] = True
+        return result
+
+    current = url
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            host = urlsplit(current).hostname
+            limit = host_limits.setdefault(host, asyncio.Semaphore(MAX_PER_HOST))
+            async with limit, connections:
+                status, headers, body = await _request(current, timeout)
+            result["status"] = status
+            if 300 <= status < 400 and "location" in headers:
+                current = urljoin(current, headers["location"])
+                continue
+            result["final_url"] = current
+            result["title"] = _title(body)
+            break
+        else:
+            result["error"] = "too many redirects"
+    except (OSError, EOFError, asyncio.TimeoutError, ValueError, IndexError) as e:
+        # EOFError covers asyncio.IncompleteReadError from a truncated body
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+async def check_urls(urls, max_connections=MAX_CONNECTIONS, timeout=TIMEOUT):
+    """Check ``urls`` concurrently; returns ``{url: result}``"""
+    connections = asyncio.Semaphore(max_connections)
+    host_limits = {}
+    results = await asyncio.gather(
+        *(check_url(url, host_limits, connections, timeout) for url in urls), return_exceptions=True
+    )
+    checked = {}
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            # One misbehaving server must not lose the results of every other URL
+            logger.warning("Link check of %s failed: %r", url, result)
+            result = {
+                "status": None, "final_url": url, "title": None,
+                "error": f"{type(result).__name__}: {result}", "checked_at": time.time(),
+            }
+        checked[url] = result
+    return checked
+
+
+def _is_transient(result):
+    """A failure that may go away on the next check (timeouts, refused, 5xx)"""
+    if result.get("expired"):
+        return False
+    return bool(result.get("error")) or (result.get("status") or 0) >= 500
+
+
+def _count_failures(previous, result):
+    if _is_transient(result):
+        result["failures"] = (previous or {}).get("failures", 0) + 1
+    return result
+
+
+def _is_fresh(result, ttl, now):
+    age = now - result.get("checked_at", 0)
+    if _is_transient(result) or result.get("status") in BROKEN_STATUSES:
+        return age < min(ttl, ERROR_TTL)
+    return age < ttl
+
+
+def load_results(path=RESULTS_PATH):
+    """Return the stored results, re-reading the file only when it changed"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    with _results_lock:
+        cached = _results.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, encoding="utf-8") as f:
+                cached = _results[path] = (mtime, json.load(f))
+        return cached[1]
+
+
+def save_results(results, path=RESULTS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def refresh(urls=None, ttl=DEFAULT_TTL, path=RESULTS_PATH, max_connections=MAX_CONNECTIONS):
+    """
+    Check every URL whose stored result is older than ``ttl`` and save
+
+    Parameters:
+    -----------
+    urls : list, optional
+        URLs to check (defaults to :func:`collect_links`)
+    ttl : int
+        Seconds a successful result stays valid
+    path : str
+        Results file
+    max_connections : int
+        Upper bound on simultaneous connections
+
+    Returns the full results dict.
+    """
+    if urls is None:
+        urls = collect_links()
+    results = dict(load_results(path))
+    now = time.time()
+    stale = [url for url in urls if url not in results or not _is_fresh(results[url], ttl, now)]
+    if stale:
+        checked = asyncio.run(check_urls(stale, max_connections))
+        for url, result in checked.items():
+            results[url] = _count_failures(results.get(url), result)
+        # Forget links that are no longer referenced anywhere
+        results = {url: result for url, result in results.items() if url in urls}
+        save_results(results, path)
+    logger.info("Link check: %d checked, %d cached", len(stale), len(urls) - len(stale))
+    return results
+
+
+def is_broken(url, path=RESULTS_PATH):
+    """
+    Return True if ``url`` is definitely dead or expired
+
+    Links that were never checked, that refuse robots (403, 429), or whose
+    last checks failed fewer than ``MAX_FAILURES`` times in a row are treated
+    as working. Reads stored results only; never touches the network.
+    """
+    expiry = presigned_expiry(url)
+    if expiry is not None and expiry < datetime.now(timezone.utc):
+        return True
+    result = load_results(path).get(url)
+    if result is None:
+        return False
+    return result.get("status") in BROKEN_STATUSES or result.get("failures", 0) >= MAX_FAILURES
+
+
+def start_scheduler(interval, ttl=DEFAULT_TTL):
+    """Run :func:`refresh` every ``interval`` seconds in a daemon thread"""
+    def loop():
+        while True:
+            try:
+                refresh(ttl=ttl)
+            except Exception:
+                logger.exception("Link check failed")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="link-check", daemon=True)
+    thread.start()
+    return thread
+
+
+def _format_results(results):
+    lines = []
+    for url, result in sorted(results.items()):
+        state = result.get("error") or result.get("status")
+        lines.append(f"{str(state)[:40]:<42}{url[:100]}")
+        if result.get("final_url") and result["final_url"] != url:
+            lines.append(f"{'':<42}-> {result['final_url'][:100]}")
+        if result.get("title"):
+            lines.append(f"{'':<42}   {result['title'][:100]}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the outbound links in the content files")
+    parser.add_argument("--ttl", type=int, default=DEFAULT_TTL, help="seconds a result stays valid")
+    parser.add_argument("--every", type=int, default=0, help="repeat every N seconds instead of exiting")
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+    while True:
+        results = refresh(ttl=args.ttl, max_connections=args.max_connections)
+        print(_format_results(results))
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Serving many portfolios from one process.
+
+The pages read the profile id from ``?profile=<id>`` (remembered in the
+session so sidebar navigation keeps it). Profiles are loaded lazily on first
+use and tracked in least-recently-used order; when more than
+``MAX_PROFILES`` are resident, or the caches grow past ``MEMORY_BUDGET``
+bytes, the least recently used profiles are evicted from every cache
+(records, fragments, images) until the process is back under budget. The
+default profile is never evicted.
+
+Both limits can be set from the environment with
+``PORTFOLIO_MAX_PROFILES`` and ``PORTFOLIO_MEMORY_BUDGET_MB``.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from portfolio import cache, content
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILES = int(os.environ.get("PORTFOLIO_MAX_PROFILES", "500"))
+MEMORY_BUDGET = int(os.environ.get("PORTFOLIO_MEMORY_BUDGET_MB", "256")) * 1024 * 1024
+
+CACHES = (cache.records, cache.fragments, cache.images)
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+
+
+def cached_bytes():
+    """Estimated bytes held by all content caches"""
+    return sum(c.nbytes() for c in CACHES)
+
+
+def profile_bytes(profile):
+    """Estimated bytes held for one profile"""
+    return sum(c.nbytes(lambda key: key[0] == profile) for c in CACHES)
+
+
+def evict(profile):
+    """Drop everything cached for a profile; it reloads on next use"""
+    for c in CACHES:
+        c.invalidate(profile)
+    with _lock:
+        _lru.pop(profile, None)
+
+
+def _enforce_budget(current):
+    victims = []
+    with _lock:
+        candidates = [p for p in _lru if p not in (current, content.DEFAULT_PROFILE)]
+        while candidates and (len(_lru) > MAX_PROFILES or cached_bytes() > MEMORY_BUDGET):
+            victim = candidates.pop(0)
+            victims.append(victim)
+            del _lru[victim]
+            for c in CACHES:
+                c.invalidate(victim)
+    if victims:
+        logger.info("Evicted %d profile(s): %s", len(victims), ", ".join(victims))
+
+
+def activate(profile):
+    """
+    Mark a profile as in use, evicting others if over budget
+
+    Raises content.UnknownProfile for ids without a profile directory.
+    """
+    content.profile_dir(profile)
+    with _lock:
+        _lru[profile] = True
+        _lru.move_to_end(profile)
+    _enforce_budget(profile)
+    return profile
+
+
+def resident():
+    """Return ``[(profile, bytes), ...]`` in least-recently-used order"""
+    with _lock:
+        order = list(_lru)
+    return [(profile, profile_bytes(profile)) for profile in order]
+
+
+def current():
+    """
+    Return the profile for this rerun from ``?profile=`` or the session
+
+    Stops the script with an error for unknown profiles.
+    """
+    requested = st.query_params.get("profile") or st.session_state.get("profile") or content.DEFAULT_PROFILE
+    try:
+        activate(requested)
+    except content.UnknownProfile:
+        st.error(f"There is no portfolio called '{requested}'.")
+        st.stop()
+    st.session_state.profile = requested
+    # Keep the id in the URL so the page can be shared and reloaded
+    if requested != content.DEFAULT_PROFILE and st.query_params.get("profile") != requested:
+        st.query_params["profile"] = requested
+    return requested
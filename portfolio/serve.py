@@ -0,0 +1,140 @@
+"""
+Start the Streamlit server with the caches warming in the background.
+
+Usage::
+
+    python -m portfolio.serve [--ready-file PATH] [--link-check-interval SECONDS]
+                              [--metrics-interval SECONDS --metrics-source DUMP_OR_URL]
+                              [--api-port PORT] [--outbound-url URL] [--slow-rerun-ms MS]
+                              [--session-idle-minutes N] [--session-memory-mb MB]
+                              [--no-catalog] [streamlit run options...]
+
+The warm-up thread starts before the server, in the same process, so the
+caches it fills are the ones the pages read. So does the contact form's
+delivery worker. Streamlit's own health check
+answers as soon as the server is up; ``--ready-file`` is created only once the
+warm-up has succeeded and is removed again on exit, which makes it usable as a
+readiness probe (``test -f <path>``). While a warm-up step keeps failing,
+``<path>.error`` holds the error instead. ``--link-check-interval`` runs the
+outbound link checker on a schedule in a background thread, and
+``--metrics-interval`` does the same for the citation metrics refresh from
+``--metrics-source`` (a dump file or an ``http(s)://`` service URL).
+``--api-port`` serves the read-only JSON API (:mod:`portfolio.api`) from the
+same process, including the ``/go`` click redirect; ``--outbound-url`` is
+that endpoint's public address, used in the outbound links. ``--slow-rerun-ms`` turns on stack sampling of reruns slower
+than the given threshold (:mod:`portfolio.slowreruns`).
+``--session-idle-minutes`` and ``--session-memory-mb`` set when idle
+browser sessions are evicted (:mod:`portfolio.sessions`).
+
+The content catalog (:mod:`portfolio.catalog`) is compiled before anything
+else so the warm-up already reads from it; ``--no-catalog`` skips that and
+serves straight from the JSON files.
+"""
+import argparse
+import atexit
+import logging
+import os
+import sys
+
+from portfolio import analytics, api, bibliometrics, catalog, contact, linkcheck, sessions, slowreruns, warmup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(ROOT, "main.py")
+
+
+def _write_ready_file(path):
+    def on_ready(status):
+        _remove(path + ".error")
+        with open(path, "w") as f:
+            f.write(f"{status['duration']:.3f}\n")
+    return on_ready
+
+
+def _write_error_file(path):
+    # Lets the probe report why the server is not ready yet
+    def on_error(status):
+        with open(path + ".error", "w") as f:
+            f.write(f"{status['error']}\n")
+    return on_error
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the portfolio with cache warm-up")
+    parser.add_argument("--ready-file", help="file created once the caches are warm")
+    parser.add_argument(
+        "--link-check-interval", type=int, default=0,
+        help="check outbound links every N seconds (default: off)",
+    )
+    parser.add_argument(
+        "--metrics-interval", type=int, default=0,
+        help="refresh citation metrics every N seconds (default: off)",
+    )
+    parser.add_argument("--metrics-source", help="works dump file or OpenAlex-compatible service URL")
+    parser.add_argument("--api-port", type=int, default=0, help="serve the JSON API on this port (default: off)")
+    parser.add_argument(
+        "--outbound-url",
+        help="public URL of the API's /go endpoint for counting outbound clicks (default: PORTFOLIO_OUTBOUND_URL)",
+    )
+    parser.add_argument(
+        "--slow-rerun-ms", type=float, default=None,
+        help="sample the stack of reruns slower than this (default: PORTFOLIO_SLOW_RERUN_MS or off)",
+    )
+    parser.add_argument(
+        "--session-idle-minutes", type=float, default=None,
+        help="evict sessions idle for this long, 0 to never (default: PORTFOLIO_SESSION_IDLE_MINUTES or 30)",
+    )
+    parser.add_argument(
+        "--session-memory-mb", type=int, default=None,
+        help="evict the most idle sessions above this total (default: PORTFOLIO_SESSION_MEMORY_MB or 128)",
+    )
+    parser.add_argument("--no-catalog", action="store_true", help="do not compile the content catalog")
+    args, streamlit_args = parser.parse_known_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+
+    if not args.no_catalog:
+        summary = catalog.compile_catalog()
+        logging.getLogger(__name__).info("Compiled content catalog: %s", summary)
+
+    # Before the warm-up, which renders the links into the card fragments
+    if args.outbound_url:
+        analytics.OUTBOUND_URL = args.outbound_url
+    on_ready = on_error = None
+    if args.ready_file:
+        for path in (args.ready_file, args.ready_file + ".error"):
+            _remove(path)
+            atexit.register(_remove, path)
+        on_ready = _write_ready_file(args.ready_file)
+        on_error = _write_error_file(args.ready_file)
+    warmup.ensure_started(on_ready, on_error)
+    # Messages queued before a restart go out without waiting for a visitor
+    contact.ensure_started()
+    if args.link_check_interval:
+        linkcheck.start_scheduler(args.link_check_interval)
+    slowreruns.configure(threshold_ms=args.slow_rerun_ms)
+    sessions.configure(idle_minutes=args.session_idle_minutes, memory_mb=args.session_memory_mb)
+    if args.api_port:
+        api.ensure_started(args.api_port)
+    if args.metrics_interval:
+        if not args.metrics_source:
+            parser.error("--metrics-interval needs --metrics-source")
+        if args.metrics_source.startswith(("http://", "https://")):
+            bibliometrics.start_scheduler(args.metrics_interval, service=args.metrics_source)
+        else:
+            bibliometrics.start_scheduler(args.metrics_interval, dump=args.metrics_source)
+
+    from streamlit.web import cli as stcli
+
+    sys.argv = ["streamlit", "run", MAIN_SCRIPT, *streamlit_args]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
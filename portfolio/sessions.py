@@ -0,0 +1,314 @@
+"""
+Per-session memory accounting and eviction of idle sessions.
+
+Every open tab holds a Streamlit session with its ``session_state``, widget
+state, and references to the media it was sent (photos, PDFs for the
+download buttons). Tabs left open in the background keep all of that alive,
+because Streamlit only drops sessions whose websocket has closed.
+
+A background thread checks the runtime's sessions every
+``CHECK_INTERVAL`` seconds. For each one it measures the ``session_state``
+size and the media files it references. A session counts as idle when its
+script has not rerun since the previous check. Sessions are evicted when
+either:
+
+* they have been idle for longer than ``IDLE_TIMEOUT``, or
+* all sessions together hold more than ``MEMORY_CEILING`` bytes; then the
+  longest-idle sessions go first, and only those idle for at least
+  ``MIN_IDLE``.
+
+Eviction closes the session on the runtime's event loop, which releases its
+media, and then closes the tab's websocket. The browser reconnects on its own
+and gets a fresh session; the widget values it sends back keep the page
+where the visitor left it. Media still referenced by sessions that
+Streamlit already dropped is released on the same pass.
+
+Measuring ``session_state`` walks its whole object graph, so a session is
+re-measured only after it has rerun, and at most every ``MEASURE_INTERVAL``
+seconds; an idle session keeps its last measurement and costs nothing.
+
+The limits can be set from the environment with
+``PORTFOLIO_SESSION_IDLE_MINUTES`` (``0`` disables the timeout) and
+``PORTFOLIO_SESSION_MEMORY_MB``. The per-session numbers are shown on the
+``/stats`` page only with ``?debug=<PORTFOLIO_DEBUG_TOKEN>``.
+
+This relies on Streamlit runtime internals (``Runtime._session_mgr`` and the
+media file manager's session references), which are not public API. When they
+are missing, accounting reports nothing and no session is evicted.
+"""
+import concurrent.futures
+import hmac
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = float(os.environ.get("PORTFOLIO_SESSION_IDLE_MINUTES", "30")) * 60
+MEMORY_CEILING = int(os.environ.get("PORTFOLIO_SESSION_MEMORY_MB", "128")) * 1024 * 1024
+MIN_IDLE = 60
+CHECK_INTERVAL = 30
+MEASURE_INTERVAL = 5 * 60
+DEBUG_TOKEN = os.environ.get("PORTFOLIO_DEBUG_TOKEN")
+
+# session id -> (script run count, time it was last seen changing)
+_activity = {}
+# session id -> (script run count, time measured, session_state bytes)
+_sizes = {}
+_stats = {"evicted": 0, "released_media": 0}
+# Media reference holders with no session at the previous check
+_orphans = set()
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def configure(idle_minutes=None, memory_mb=None):
+    """Override the environment settings (used by the serve launcher)"""
+    global IDLE_TIMEOUT, MEMORY_CEILING
+    if idle_minutes is not None:
+        IDLE_TIMEOUT = idle_minutes * 60
+    if memory_mb is not None:
+        MEMORY_CEILING = memory_mb * 1024 * 1024
+
+
+def _runtime():
+    from streamlit import runtime
+
+    if not runtime.exists():
+        return None
+    rt = runtime.get_instance()
+    if not hasattr(rt, "_session_mgr") or not hasattr(rt, "_get_async_objs"):
+        return None
+    return rt
+
+
+def _on_event_loop(rt, func, timeout=10):
+    """Run ``func`` on the runtime's event loop and return its result"""
+    loop = rt._get_async_objs().eventloop
+    future = concurrent.futures.Future()
+
+    def call():
+        try:
+            future.set_result(func())
+        except Exception as e:
+            future.set_exception(e)
+
+    loop.call_soon_threadsafe(call)
+    return future.result(timeout)
+
+
+def _list_sessions(rt):
+    # The session manager is not thread safe; copy its lists on the loop
+    def snapshot():
+        return [
+            (info.session.id, info.session, info.client is not None, info.script_run_count)
+            for info in rt._session_mgr.list_sessions()
+        ]
+
+    return _on_event_loop(rt, snapshot)
+
+
+def _media_refs(rt):
+    """Return ({session id: set of file ids}, {file id: size in bytes})"""
+    manager = rt.media_file_mgr
+    storage = getattr(manager, "_storage", None)
+    files = getattr(storage, "_files_by_id", {})
+    with manager._lock:
+        refs = {
+            session_id: set(by_coord.values())
+            for session_id, by_coord in manager._files_by_session_and_coord.items()
+        }
+    sizes = {}
+    for file_ids in refs.values():
+        for file_id in file_ids:
+            file = files.get(file_id)
+            sizes[file_id] = file.content_size if file is not None else 0
+    return refs, sizes
+
+
+def _state_bytes(session, runs, now):
+    """Size of a session's state, re-measured only after it reran"""
+    cached = _sizes.get(session.id)
+    if cached is not None and (cached[0] == runs or now - cached[1] < MEASURE_INTERVAL):
+        return cached[2]
+    # Vendored with Streamlit, which uses it for its own session_state stats
+    from streamlit.vendor.pympler.asizeof import asizeof
+
+    try:
+        size = asizeof(session.session_state)
+    except Exception:
+        size = 0
+    _sizes[session.id] = (runs, now, size)
+    return size
+
+
+def account(now=None):
+    """
+    Measure every session the runtime knows about
+
+    Returns a list of dicts with ``id``, ``connected``, ``running``, ``runs``,
+    ``idle`` (seconds), ``state_bytes`` and ``media_bytes``; most idle first.
+    Media shared by several sessions is counted in each of them.
+    """
+    now = time.time() if now is None else now
+    rt = _runtime()
+    if rt is None:
+        return []
+    sessions = _list_sessions(rt)
+    refs, sizes = _media_refs(rt)
+
+    report = []
+    seen = set()
+    for session_id, session, connected, runs in sessions:
+        seen.add(session_id)
+        last = _activity.get(session_id)
+        if last is None or last[0] != runs:
+            last = _activity[session_id] = (runs, now)
+        file_ids = refs.get(session_id, set())
+        report.append({
+            "id": session_id,
+            "connected": connected,
+            "running": getattr(session, "_scriptrunner", None) is not None,
+            "runs": runs,
+            "idle": now - last[1],
+            "state_bytes": _state_bytes(session, runs, now),
+            "media_files": len(file_ids),
+            "media_bytes": sum(sizes[file_id] for file_id in file_ids),
+        })
+    for session_id in list(_activity):
+        if session_id not in seen:
+            _activity.pop(session_id, None)
+            _sizes.pop(session_id, None)
+    report.sort(key=lambda row: row["idle"], reverse=True)
+    return report
+
+
+def total_bytes(report):
+    """Bytes held by the sessions in ``report``; shared media counted once"""
+    rt = _runtime()
+    refs, sizes = _media_refs(rt) if rt is not None else ({}, {})
+    file_ids = set()
+    for row in report:
+        file_ids |= refs.get(row["id"], set())
+    return sum(row["state_bytes"] for row in report) + sum(sizes.get(f, 0) for f in file_ids)
+
+
+def evict(session_id):
+    """Close a session and its websocket; the tab reconnects to a new one"""
+    rt = _runtime()
+    if rt is None:
+        return False
+
+    def close():
+        info = rt._session_mgr.get_session_info(session_id)
+        if info is None:
+            return False
+        client = info.client
+        # Shutting the session down releases its media references
+        rt.close_session(session_id)
+        if client is not None and hasattr(client, "close"):
+            client.close()
+        return True
+
+    closed = _on_event_loop(rt, close)
+    if closed:
+        _activity.pop(session_id, None)
+        _sizes.pop(session_id, None)
+        _stats["evicted"] += 1
+    return closed
+
+
+def release_orphaned_media():
+    """
+    Drop media references held for sessions the runtime no longer has
+
+    Streamlit forgets a disconnected session after a couple of minutes
+    without shutting it down, so its media stays referenced. A reference is
+    only released once two checks in a row found no session for it, so a tab
+    that is still connecting keeps its images.
+    """
+    global _orphans
+    rt = _runtime()
+    if rt is None:
+        return 0
+    known = {session_id for session_id, _, _, _ in _list_sessions(rt)}
+    refs, _ = _media_refs(rt)
+    unknown = {session_id for session_id in refs if session_id not in known}
+    orphans, _orphans = unknown & _orphans, unknown - _orphans
+    for session_id in orphans:
+        rt.media_file_mgr.clear_session_refs(session_id)
+    if orphans:
+        rt.media_file_mgr.remove_orphaned_files()
+        _stats["released_media"] += len(orphans)
+    return len(orphans)
+
+
+def choose_victims(report, total):
+    """Pick the sessions to evict from an :func:`account` report"""
+    candidates = [row for row in report if not row["running"]]
+    victims = []
+    if IDLE_TIMEOUT > 0:
+        victims = [row for row in candidates if row["idle"] > IDLE_TIMEOUT]
+    chosen = {row["id"] for row in victims}
+    remaining = total - sum(row["state_bytes"] + row["media_bytes"] for row in victims)
+    # The report is sorted most idle first
+    for row in candidates:
+        if remaining <= MEMORY_CEILING or row["idle"] < MIN_IDLE:
+            break
+        if row["id"] not in chosen:
+            victims.append(row)
+            remaining -= row["state_bytes"] + row["media_bytes"]
+    return victims
+
+
+def enforce():
+    """Account for all sessions and evict the ones over the limits"""
+    report = account()
+    total = total_bytes(report)
+    victims = choose_victims(report, total)
+    for row in victims:
+        try:
+            evict(row["id"])
+        except Exception as e:
+            logger.warning("Could not evict session %s: %s", row["id"], e)
+    if victims:
+        logger.info(
+            "Evicted %d idle session(s); sessions held %.1f MB",
+            len(victims), total / 2**20,
+        )
+    evicted = {row["id"] for row in victims}
+    report = [row for row in report if row["id"] not in evicted]
+    release_orphaned_media()
+    return report
+
+
+def _run(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            enforce()
+        except Exception:
+            logger.exception("Session check failed")
+
+
+def ensure_started(interval=None):
+    """Start the session reaper once per process"""
+    global _reaper
+    with _reaper_lock:
+        if _reaper is None:
+            interval = CHECK_INTERVAL if interval is None else interval
+            _reaper = threading.Thread(target=_run, args=(interval,), name="session-reaper", daemon=True)
+            _reaper.start()
+    return _reaper
+
+
+def debug_allowed(token):
+    """True when ``token`` matches ``PORTFOLIO_DEBUG_TOKEN`` (never if unset)"""
+    if not DEBUG_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), DEBUG_TOKEN.encode())
+
+
+def stats():
+    return dict(_stats)
@@ -0,0 +1,223 @@
+"""
+Stack sampling for slow reruns (opt-in).
+
+Set ``PORTFOLIO_SLOW_RERUN_MS`` (or pass ``--slow-rerun-ms`` to
+``python -m portfolio.serve``) to enable it. Each page wraps its ``main()``
+in :func:`watch`. A single background thread notices when a rerun has been
+running longer than the threshold. From then until the rerun ends it samples
+that thread's stack with ``sys._current_frames()`` every
+``PORTFOLIO_SLOW_RERUN_INTERVAL_MS`` (default 5). Reruns that finish under
+the threshold cost two dict operations and are never sampled.
+
+A slow rerun's samples are written in collapsed-stack format (one
+``frame;frame;frame count`` line per distinct stack, root first), which
+``flamegraph.pl``, speedscope and inferno read directly. Files are named
+``<time>-<page>-<session>-<duration>ms.folded`` and live in
+``.cache/slow-reruns/``. Only the newest ``PORTFOLIO_SLOW_RERUN_KEEP``
+(default 50) are kept.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from portfolio import content
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.path.join(content.CACHE_DIR, "slow-reruns")
+
+_threshold = os.environ.get("PORTFOLIO_SLOW_RERUN_MS")
+THRESHOLD = float(_threshold) / 1000 if _threshold else None
+INTERVAL = float(os.environ.get("PORTFOLIO_SLOW_RERUN_INTERVAL_MS", "5")) / 1000
+KEEP = int(os.environ.get("PORTFOLIO_SLOW_RERUN_KEEP", "50"))
+
+_active = {}
+_active_lock = threading.Lock()
+_wakeup = threading.Event()
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def configure(threshold_ms=None, interval_ms=None, keep=None):
+    """Override the environment settings (used by the serve launcher)"""
+    global THRESHOLD, INTERVAL, KEEP
+    if threshold_ms is not None:
+        THRESHOLD = threshold_ms / 1000 if threshold_ms > 0 else None
+    if interval_ms is not None:
+        INTERVAL = interval_ms / 1000
+    if keep is not None:
+        KEEP = keep
+
+
+def _frame_name(code):
+    path = code.co_filename
+    if path.startswith(content.ROOT + os.sep):
+        path = os.path.relpath(path, content.ROOT)
+    else:
+        path = os.path.basename(path)
+    # ';' separates frames and ' ' the count in the collapsed format
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":").replace(" ", "_")
+
+
+def _collapse(frame, root):
+    """Return the stack above (and including) ``root`` as a collapsed string"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        if frame.f_code is root:
+            break
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Watch:
+    """One rerun being timed; collects samples once it passes the threshold"""
+
+    def __init__(self, page, session, thread_id, root):
+        self.page = page
+        self.session = session
+        self.thread_id = thread_id
+        self.root = root
+        self.started = time.monotonic()
+        self.deadline = self.started + THRESHOLD
+        self.samples = Counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        with _active_lock:
+            _active.pop(self.thread_id, None)
+        duration = time.monotonic() - self.started
+        if duration >= THRESHOLD and self.samples:
+            try:
+                path = save(self, duration)
+                logger.warning(
+                    "Slow rerun of %s took %.0fms (%d samples): %s",
+                    self.page, duration * 1000, sum(self.samples.values()), path,
+                )
+            except OSError as e:
+                logger.warning("Could not save slow rerun profile: %s", e)
+        return False
+
+
+class _Disabled:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def watch(page, session=None):
+    """
+    Time the rerun of ``page`` and sample it if it gets slow
+
+    Use as ``with slowreruns.watch("projects"): main()``; does nothing
+    unless a threshold is configured.
+    """
+    if THRESHOLD is None:
+        return _Disabled()
+    ensure_started()
+    if session is None:
+        session = _session_id()
+    # The caller's frame is the root of the sampled stacks
+    root = sys._getframe(1).f_code
+    thread_id = threading.get_ident()
+    current = Watch(page, session, thread_id, root)
+    with _active_lock:
+        _active[thread_id] = current
+    _wakeup.set()
+    return current
+
+
+def _session_id():
+    # Imported here so the sampler does not pull in Streamlit on its own
+    from portfolio import analytics
+
+    try:
+        return analytics.session_id()
+    except Exception:
+        return "unknown"
+
+
+def _sample():
+    """Take one sample of every slow rerun; returns the earliest pending deadline"""
+    now = time.monotonic()
+    # Sampling under the lock means a finished rerun is never sampled while saved
+    with _active_lock:
+        slow = [w for w in _active.values() if now >= w.deadline]
+        if slow:
+            frames = sys._current_frames()
+            for w in slow:
+                frame = frames.get(w.thread_id)
+                if frame is not None:
+                    w.samples[_collapse(frame, w.root)] += 1
+            del frames
+            return now
+        return min((w.deadline for w in _active.values()), default=None)
+
+
+def _run():
+    while True:
+        _wakeup.clear()
+        deadline = _sample()
+        now = time.monotonic()
+        if deadline is not None and deadline <= now:
+            time.sleep(INTERVAL)
+        else:
+            # Nothing is slow yet: sleep until the earliest deadline or a new rerun
+            _wakeup.wait(None if deadline is None else deadline - now)
+
+
+def ensure_started():
+    """Start the sampler thread once per process"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = threading.Thread(target=_run, name="slow-rerun-sampler", daemon=True)
+            _sampler.start()
+    return _sampler
+
+
+def _slug(value):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(value))[:40]
+
+
+def save(w, duration, directory=PROFILE_DIR):
+    """Write a watch's samples as a collapsed-stack file and trim the ring"""
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+    name = f"{stamp}-{_slug(w.page)}-{_slug(w.session)[:12]}-{duration * 1000:.0f}ms.folded"
+    path = os.path.join(directory, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for stack, count in w.samples.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp_path, path)
+    trim(directory)
+    return path
+
+
+def trim(directory=PROFILE_DIR, keep=None):
+    """Delete all but the newest ``keep`` profiles"""
+    keep = KEEP if keep is None else keep
+    profiles = sorted(name for name in os.listdir(directory) if name.endswith(".folded"))
+    for name in profiles[:max(len(profiles) - keep, 0)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def recent(directory=PROFILE_DIR):
+    """Return the stored profile paths, newest first"""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted((name for name in os.listdir(directory) if name.endswith(".folded")), reverse=True)
+    return [os.path.join(directory, name) for name in names]
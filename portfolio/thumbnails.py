@@ -0,0 +1,180 @@
+"""
+Image galleries: thumbnails first, full size on request.
+
+Project and paper images are shown as small progressive JPEG thumbnails. The
+larger version of an image is sent only when the visitor asks for it. Both
+sizes are generated once in a background thread pool and stored in
+``.cache/thumbs/``, where every worker process can reuse them.
+
+File names include the source's mtime and size, so an edited image gets
+fresh derivatives without any invalidation.
+
+Both pages render galleries with :func:`display_gallery`.
+
+Thumbnails are JPEG rather than WebP because ``st.image`` passes JPEG bytes
+through untouched but re-encodes every other format.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import streamlit as st
+from PIL import Image, ImageOps
+
+from portfolio import content
+
+logger = logging.getLogger(__name__)
+
+THUMB_DIR = os.path.join(content.CACHE_DIR, "thumbs")
+
+THUMB_WIDTH = 480
+# Streamlit scales anything wider than its content area down before sending,
+# so this is the largest useful "full size"
+FULL_WIDTH = 1400
+THUMB_QUALITY = 75
+FULL_QUALITY = 85
+
+# Seconds a rerun waits for missing thumbnails before showing placeholders
+WAIT = 2.0
+POOL_SIZE = 4
+
+_pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="thumbnails")
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def gallery_items(image_path=None, gallery=None):
+    """
+    Return ``[(path, caption), ...]`` for an entry's images that exist
+
+    ``gallery`` entries are either paths or ``{"path": ..., "caption": ...}``;
+    a single ``image_path`` comes first.
+    """
+    result = []
+    for item in ([image_path] if image_path else []) + list(gallery or []):
+        if isinstance(item, str):
+            path, caption = item, None
+        else:
+            path, caption = item["path"], item.get("caption")
+        if os.path.exists(path):
+            result.append((path, caption))
+    return result
+
+
+def derivative_path(path, width):
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}:{width}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(THUMB_DIR, digest[:2], f"{digest}.jpg")
+
+
+def _render(source, target, width):
+    quality = THUMB_QUALITY if width <= THUMB_WIDTH else FULL_QUALITY
+    with Image.open(source) as img:
+        # Lets the JPEG decoder scale down while decoding
+        img.draft("RGB", (width, width * 4))
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, "white")
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        else:
+            img = img.convert("RGB")
+        if img.width > width:
+            img = img.resize((width, int(img.height * width / img.width)), Image.LANCZOS)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(tmp_path, target)
+    return target
+
+
+def _done(target, future):
+    with _pending_lock:
+        _pending.pop(target, None)
+    if future.exception() is not None:
+        logger.warning("Could not render %s: %s", target, future.exception())
+
+
+def schedule(path, width=THUMB_WIDTH):
+    """
+    Make sure a derivative exists or is being generated
+
+    Returns ``(target, future)``; the future is None when the file is already
+    on disk.
+    """
+    target = derivative_path(path, width)
+    if os.path.exists(target):
+        return target, None
+    with _pending_lock:
+        future = _pending.get(target)
+        submitted = future is None
+        if submitted:
+            future = _pending[target] = _pool.submit(_render, path, target, width)
+    if submitted:
+        # Outside the lock: the callback runs right away if the job already finished
+        future.add_done_callback(lambda f: _done(target, f))
+    return target, future
+
+
+def derivatives(paths, width=THUMB_WIDTH, timeout=WAIT):
+    """
+    Return the derivative file for each path, or None where it is not ready
+
+    Missing derivatives are generated in parallel; waits at most
+    ``timeout`` seconds for them (None waits until all are done).
+    """
+    scheduled = [schedule(path, width) for path in paths]
+    futures = [future for _, future in scheduled if future is not None]
+    if futures:
+        wait(futures, timeout=timeout)
+    return [target if os.path.exists(target) else None for target, _ in scheduled]
+
+
+def previews(paths):
+    """Return the thumbnail file for each path, or None where it is not ready yet"""
+    return derivatives(paths, THUMB_WIDTH)
+
+
+def full_size(path):
+    """Return the full-size file for one image, generating it if needed"""
+    return derivatives([path], FULL_WIDTH, timeout=None)[0]
+
+
+def display_gallery(items, key, columns=4):
+    """
+    Display images as thumbnails, each with a toggle for the full-size image
+
+    Only the thumbnails are sent with the page. A full-size image is sent
+    once its toggle is switched on (an expander would send it regardless).
+
+    Parameters:
+    -----------
+    items : list
+        List of (path, caption) tuples, see gallery_items
+    key : str
+        Prefix for the widget keys, unique per entry
+    columns : int, optional
+        Number of thumbnails per row
+    """
+    thumbs = previews([path for path, _ in items])
+    expanded = []
+    cols = st.columns(columns)
+    for i, ((path, caption), preview) in enumerate(zip(items, thumbs)):
+        with cols[i % columns]:
+            if preview:
+                st.image(preview, caption=caption, use_container_width=True)
+            else:
+                st.caption("Preview is being generated, refresh in a moment.")
+            if st.toggle("Full size", key=f"{key}-full-{i}"):
+                expanded.append((path, caption))
+
+    for path, caption in expanded:
+        full = full_size(path)
+        if full:
+            st.image(full, caption=caption)
+        else:
+            st.warning("Could not load this image.")
@@ -0,0 +1,124 @@
+"""
+Cache warm-up at server start.
+
+Decoding and resizing the profile photo, parsing the content files,
+generating gallery thumbnails and rendering the card fragments are all done
+once per process (thumbnails once per host). Without a warm-up the first
+visitor to each page pays for them; :func:`ensure_started` runs them in a
+background thread instead so the server keeps answering while the caches
+fill.
+
+``READY`` is set once every hot path is cached, and never before. A step
+that fails is retried every ``RETRY_INTERVAL`` seconds (the watcher picks up
+a fixed content file in the meantime); until then ``status["error"]`` holds
+the failure. ``python -m portfolio.serve`` starts the warm-up before
+Streamlit and can mirror both to files for readiness probes.
+"""
+import logging
+import threading
+import time
+
+from portfolio import content, fragments, images, thumbnails
+
+logger = logging.getLogger(__name__)
+
+READY = threading.Event()
+
+RETRY_INTERVAL = 30
+
+status = {
+    "started_at": None,
+    "duration": None,
+    "steps": {},
+    "error": None,
+    "attempts": 0,
+}
+
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _warm_content():
+    content.profile_info()
+    for kind in content.FILES:
+        content.entries(kind)
+
+
+def _warm_images():
+    photo = content.profile_info().get("photo")
+    if photo:
+        images.resized(photo, images.PROFILE_PHOTO_WIDTH)
+    paths = []
+    for kind in content.FILES:
+        for _, fields in content.entries(kind):
+            items = thumbnails.gallery_items(fields.get("image_path"), fields.get("gallery"))
+            paths += [path for path, _ in items]
+    thumbnails.derivatives(paths, timeout=None)
+
+
+def _warm_fragments():
+    for kind in content.FILES:
+        for entry_id, fields in content.entries(kind):
+            fragments.warm(content.DEFAULT_PROFILE, kind, entry_id, fields)
+
+
+# Steps run in order; later steps reuse what earlier ones cached. Only the
+# default profile is warmed; other profiles load lazily on first visit.
+STEPS = [
+    ("content", _warm_content),
+    ("images", _warm_images),
+    ("fragments", _warm_fragments),
+]
+
+
+def run(on_ready=None, on_error=None):
+    """
+    Run every warm-up step, then set ``READY``
+
+    Parameters:
+    -----------
+    on_ready : callable, optional
+        Called with the status dict once the caches are warm
+    on_error : callable, optional
+        Called with the status dict each time a step fails
+    """
+    status["started_at"] = time.time()
+    start = time.perf_counter()
+    pending = list(STEPS)
+    while pending:
+        name, step = pending[0]
+        status["attempts"] += 1
+        step_start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # The server keeps answering (pages report the error on their own
+            # rerun), but it is not ready until the step succeeds
+            status["error"] = f"{name}: {e!r}"
+            logger.exception("Cache warm-up step %s failed; retrying in %ds", name, RETRY_INTERVAL)
+            if on_error is not None:
+                on_error(status)
+            time.sleep(RETRY_INTERVAL)
+            continue
+        status["steps"][name] = time.perf_counter() - step_start
+        pending.pop(0)
+    status["error"] = None
+    status["duration"] = time.perf_counter() - start
+    logger.info(
+        "Cache warm-up finished in %.3fs (%s)",
+        status["duration"],
+        ", ".join(f"{name} {seconds:.3f}s" for name, seconds in status["steps"].items()),
+    )
+    READY.set()
+    if on_ready is not None:
+        on_ready(status)
+
+
+def ensure_started(on_ready=None, on_error=None):
+    """Start the warm-up thread once per process; safe to call on every rerun"""
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run, args=(on_ready, on_error), name="cache-warmup", daemon=True)
+            _thread.start()
+    return _thread
@@ -0,0 +1,134 @@
+"""
+Hot reload of the content files and assets.
+
+A background thread polls ``content/`` and ``assets/`` for modified, added or
+removed files. Bursts of saves (editors often write a file several times) are
+debounced into one batch, and each batch invalidates only what depends on
+the changed files:
+
+* a content file of a loaded profile is re-read and only the entries that
+  differ are replaced (their rendered fragments are dropped with them);
+  profiles that are not in memory are skipped;
+* an image drops its resized derivatives.
+
+Connected sessions pick the new content up on their next rerun.
+"""
+import logging
+import os
+import threading
+import time
+
+from portfolio import cache, content, images
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.5
+DEBOUNCE = 0.3
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def _snapshot(directories):
+    """Return ``{path: (mtime_ns, size)}`` for every file under ``directories``"""
+    state = {}
+    for directory in directories:
+        for dirpath, _, filenames in os.walk(directory):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                state[path] = (stat.st_mtime_ns, stat.st_size)
+    return state
+
+
+def apply_changes(paths):
+    """
+    Invalidate the caches that depend on ``paths``
+
+    Returns a summary dict of what was invalidated, mainly for logging.
+    """
+    summary = {"entries": {}, "images": 0}
+    loaded = content.loaded_profiles()
+    for path in sorted(paths):
+        located = content.locate(path)
+        if located is None:
+            summary["images"] += images.invalidate(path)
+            continue
+        profile, kind = located
+        if profile not in loaded:
+            # Not in memory; it will be read fresh when first visited
+            continue
+        if kind == "profile":
+            cache.records.invalidate(profile, "profile")
+            summary["entries"][(profile, kind)] = ["*"]
+            continue
+        try:
+            summary["entries"][(profile, kind)] = sorted(content.refresh(kind, profile))
+        except (OSError, ValueError, content.UnknownProfile) as e:
+            # Half-written or invalid file: keep serving the old entries
+            logger.warning("Could not reload %s: %s", path, e)
+    return summary
+
+
+class ContentWatcher(threading.Thread):
+    """
+    Poll directories and hand debounced batches of changed paths to a callback
+
+    Parameters:
+    -----------
+    directories : list
+        Directories to watch recursively
+    on_change : callable
+        Called with a set of changed file paths
+    interval : float
+        Seconds between polls
+    debounce : float
+        Quiet period (seconds) required before a batch is dispatched
+    """
+
+    def __init__(self, directories, on_change, interval=POLL_INTERVAL, debounce=DEBOUNCE):
+        super().__init__(name="content-watcher", daemon=True)
+        self.directories = directories
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+        self._stopped = threading.Event()
+
+    def run(self):
+        state = _snapshot(self.directories)
+        pending = set()
+        last_change = 0.0
+        while not self._stopped.wait(self.interval):
+            current = _snapshot(self.directories)
+            changed = {
+                path for path in state.keys() | current.keys()
+                if state.get(path) != current.get(path)
+            }
+            state = current
+            now = time.monotonic()
+            if changed:
+                pending |= changed
+                last_change = now
+            elif pending and now - last_change >= self.debounce:
+                batch, pending = pending, set()
+                try:
+                    summary = self.on_change(batch)
+                    logger.info("Reloaded content after %d change(s): %s", len(batch), summary)
+                except Exception:
+                    logger.exception("Content reload failed")
+
+    def stop(self):
+        self._stopped.set()
+
+
+def ensure_started():
+    """Start the process-wide watcher once; safe to call on every rerun"""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = ContentWatcher([content.CONTENT_DIR, content.ASSETS_DIR], apply_changes)
+            _watcher.start()
+    return _watcher
@@ -0,0 +1,69 @@
+"""Outbound click validation and per-profile aggregates"""
+import json
+import sqlite3
+
+import pytest
+
+from portfolio import analytics, content
+
+
+@pytest.fixture
+def tenant(tmp_path, monkeypatch):
+    directory = tmp_path / "profiles" / "tenant"
+    directory.mkdir(parents=True)
+    (directory / "profile.json").write_text(json.dumps({"name": "T", "links": {"Site": "https://t.example"}}))
+    (directory / "projects.json").write_text(json.dumps([
+        {"id": "a", "title": "A", "links": {"Code": "https://code.example"}},
+    ]))
+    monkeypatch.setattr(content, "PROFILES_DIR", str(tmp_path / "profiles"))
+    return "tenant"
+
+
+def test_outbound_check_does_not_cache_unvisited_profiles(tenant, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(analytics, "record", lambda *event, **kwargs: recorded.append(event))
+    assert analytics.follow_outbound("https://t.example", "home", tenant)
+    assert analytics.follow_outbound("https://code.example", "projects", tenant)
+    assert not analytics.follow_outbound("https://evil.example", "projects", tenant)
+    assert tenant not in content.loaded_profiles()
+    assert len(recorded) == 2
+
+
+def test_aggregates_are_per_profile(tmp_path):
+    path = str(tmp_path / "analytics.db")
+    conn = analytics.connect(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO events (ts, kind, page, target, session, profile) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (100, analytics.PAGE_VIEW, "home", None, "s1", "default"),
+                (100, analytics.OUTBOUND_CLICK, "home", "https://a.example", "s1", "default"),
+                (100, analytics.PAGE_VIEW, "projects", None, "s2", "tenant"),
+                (100, analytics.PAGE_VIEW, "research", None, "s3", "tenant"),
+            ],
+        )
+    conn.close()
+
+    assert analytics.summary(0, "default", path)["page_views"] == 1
+    tenant = analytics.summary(0, "tenant", path)
+    assert (tenant["page_views"], tenant["outbound_clicks"], tenant["sessions"]) == (2, 0, 2)
+    assert analytics.counts_by(analytics.OUTBOUND_CLICK, "target", 0, profile="tenant", path=path) == []
+    assert sorted(analytics.counts_by(analytics.PAGE_VIEW, "page", 0, profile="tenant", path=path)) == [
+        ("projects", 1), ("research", 1),
+    ]
+    assert analytics.daily_page_views(0, "other", path) == []
+
+
+def test_old_database_is_migrated_to_the_default_profile(tmp_path):
+    path = str(tmp_path / "analytics.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE events (id INTEGER PRIMARY KEY, ts REAL NOT NULL, kind TEXT NOT NULL, "
+        "page TEXT NOT NULL, target TEXT, session TEXT)"
+    )
+    with conn:
+        conn.execute("INSERT INTO events (ts, kind, page) VALUES (100, ?, 'home')", (analytics.PAGE_VIEW,))
+    conn.close()
+
+    assert analytics.summary(0, content.DEFAULT_PROFILE, path)["page_views"] == 1
+    assert analytics.summary(0, "tenant", path)["page_views"] == 0
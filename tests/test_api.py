@@ -0,0 +1,148 @@
+"""JSON API over HTTP: ETags, gzip, field filtering, pagination and errors"""
+import gzip
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from portfolio import api, catalog, content
+
+PROFILE = "apitest"
+PROJECTS = [
+    {
+        "id": f"p{i}",
+        "title": f"Project {i}",
+        "description": "A project description long enough to make the list worth compressing. " * 3,
+        "tags": ["python", "streamlit"],
+        "links": {"Code": f"https://code.example/{i}"},
+        "image_path": "media/missing.png",
+    }
+    for i in range(25)
+]
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    directory = tmp_path / "profiles" / PROFILE
+    directory.mkdir(parents=True)
+    (directory / "projects.json").write_text(json.dumps(PROJECTS))
+    monkeypatch.setattr(content, "PROFILES_DIR", str(tmp_path / "profiles"))
+    # Always read the JSON, whatever catalog the checkout has compiled
+    monkeypatch.setattr(catalog, "lookup", lambda kind, profile: None)
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), api.Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+def get(port, path, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_etag_answers_304_until_content_changes(server):
+    status, headers, body = get(server, f"/api/{PROFILE}/projects/p1")
+    assert status == 200
+    assert json.loads(body)["title"] == "Project 1"
+    etag = headers["ETag"]
+
+    status, headers, body = get(server, f"/api/{PROFILE}/projects/p1", {"If-None-Match": etag})
+    assert (status, body, headers["ETag"]) == (304, b"", etag)
+    status, _, _ = get(server, f"/api/{PROFILE}/projects/p1", {"If-None-Match": f'"other", W/{etag}'})
+    assert status == 304
+
+    edited = [dict(PROJECTS[0])] + [dict(PROJECTS[1], title="Renamed")] + PROJECTS[2:]
+    path = content.content_path("projects", PROFILE)
+    with open(path, "w") as f:
+        json.dump(edited, f)
+    content.refresh("projects", PROFILE)
+
+    status, headers, body = get(server, f"/api/{PROFILE}/projects/p1", {"If-None-Match": etag})
+    assert status == 200
+    assert headers["ETag"] != etag
+    assert json.loads(body)["title"] == "Renamed"
+
+
+def test_gzip_variant_has_its_own_etag(server):
+    status, plain_headers, plain = get(server, f"/api/{PROFILE}/projects")
+    assert status == 200 and "Content-Encoding" not in plain_headers
+
+    status, headers, body = get(server, f"/api/{PROFILE}/projects", {"Accept-Encoding": "gzip"})
+    assert status == 200
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Vary"] == "Accept-Encoding"
+    assert headers["ETag"] == plain_headers["ETag"][:-1] + '-gz"'
+    assert gzip.decompress(body) == plain
+
+    status, _, _ = get(server, f"/api/{PROFILE}/projects", {
+        "Accept-Encoding": "gzip", "If-None-Match": headers["ETag"],
+    })
+    assert status == 304
+    # The plain ETag does not validate the gzipped body
+    status, _, _ = get(server, f"/api/{PROFILE}/projects", {
+        "Accept-Encoding": "gzip", "If-None-Match": plain_headers["ETag"],
+    })
+    assert status == 200
+
+
+def test_fields_limit_the_items(server):
+    status, _, body = get(server, f"/api/{PROFILE}/projects/p2?fields=links,title")
+    assert status == 200
+    assert json.loads(body) == {"id": "p2", "title": "Project 2", "links": {"Code": "https://code.example/2"}}
+
+    status, _, body = get(server, f"/api/{PROFILE}/projects/p2")
+    assert "image_path" not in json.loads(body)
+
+    status, _, body = get(server, f"/api/{PROFILE}/projects?fields=title,image_path")
+    assert status == 400
+    assert "image_path" in json.loads(body)["error"]
+
+
+def test_pagination(server):
+    status, _, body = get(server, f"/api/{PROFILE}/projects?page=3&per_page=10")
+    payload = json.loads(body)
+    assert status == 200
+    assert (payload["total"], payload["pages"], payload["page"], payload["per_page"]) == (25, 3, 3, 10)
+    assert [item["id"] for item in payload["items"]] == ["p20", "p21", "p22", "p23", "p24"]
+
+    _, _, body = get(server, f"/api/{PROFILE}/projects")
+    assert len(json.loads(body)["items"]) == api.PER_PAGE
+
+    _, _, body = get(server, f"/api/{PROFILE}/projects?page=9")
+    assert json.loads(body)["items"] == []
+
+
+@pytest.mark.parametrize("query, message", [
+    ("per_page=101", "per_page must be between 1 and 100"),
+    ("per_page=0", "per_page must be between 1 and 100"),
+    ("page=0", "page must be a positive integer"),
+    ("page=two", "page must be an integer"),
+])
+def test_bad_pagination_is_400(server, query, message):
+    status, _, body = get(server, f"/api/{PROFILE}/projects?{query}")
+    assert (status, json.loads(body)["error"]) == (400, message)
+
+
+@pytest.mark.parametrize("path", [
+    f"/api/{PROFILE}/projects/nope",
+    f"/api/{PROFILE}/talks",
+    "/api/no-such-profile/projects",
+    f"/api/{PROFILE}/projects/p1/extra",
+    "/elsewhere",
+])
+def test_unknown_paths_are_404(server, path):
+    status, _, body = get(server, path)
+    assert status == 404
+    assert "error" in json.loads(body)
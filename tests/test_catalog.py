@@ -0,0 +1,150 @@
+"""Compiled catalog: round trip against the JSON files and stale fallback"""
+import functools
+import json
+import os
+
+import pytest
+
+from portfolio import catalog, content
+
+PROJECTS = [
+    {
+        "id": "alpha",
+        "title": "Alpha ✓",
+        "description": "shared text",
+        "stars": 12,
+        "score": 0.25,
+        "featured": True,
+        "archived": False,
+        "video_url": None,
+        "tags": ["python", "shared text", ["nested", 3]],
+        "links": {"Code": "https://code.example", "Demo": "https://demo.example"},
+        "image_path": "media/a.png",
+        "gallery": ["media/a.png", {"path": "media/a.png", "caption": "Alpha"}],
+    },
+    {"id": "beta", "title": "Beta", "description": "shared text", "tags": [], "links": {}},
+]
+PAPERS = [{"id": "p1", "title": "Paper", "year": 2024, "authors": ["A", "B"], "negative": -7}]
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    """A default profile and one tenant with their own content files"""
+    default = tmp_path / "content"
+    tenant = default / "profiles" / "tenant"
+    for directory in (default, tenant):
+        (directory / "media").mkdir(parents=True)
+        (directory / "media" / "a.png").write_bytes(b"png")
+        (directory / "projects.json").write_text(json.dumps(PROJECTS))
+    (default / "papers.json").write_text(json.dumps(PAPERS))
+    monkeypatch.setattr(content, "CONTENT_DIR", str(default))
+    monkeypatch.setattr(content, "PROFILES_DIR", str(default / "profiles"))
+    # Do not leave a mapping of the temporary catalog behind
+    monkeypatch.setattr(catalog, "_catalog", None)
+    monkeypatch.setattr(catalog, "_catalog_key", None)
+    return tmp_path
+
+
+@pytest.fixture
+def compiled(tree):
+    path = str(tree / "catalog.bin")
+    summary = catalog.compile_catalog(path)
+    return path, summary
+
+
+def test_round_trip_matches_the_json_files(compiled):
+    path, summary = compiled
+    # The tenant has no papers.json, so three sections
+    assert summary["sections"] == 3
+    assert summary["entries"] == 5
+
+    sections = [(content.DEFAULT_PROFILE, "projects"), (content.DEFAULT_PROFILE, "papers"), ("tenant", "projects")]
+    for profile, kind in sections:
+        rows = catalog.lookup(kind, profile, path)
+        expected = content.parse_entries(kind, profile)
+        assert [(entry_id, digest) for entry_id, digest, _ in rows] == [
+            (entry_id, digest) for entry_id, digest, _ in expected
+        ]
+        assert [catalog.to_python(record) for *_, record in rows] == [fields for *_, fields in expected]
+
+    assert catalog.lookup("papers", "tenant", path) is None
+
+
+def test_records_are_lazy_views(compiled):
+    path, _ = compiled
+    [(entry_id, _, record), _] = catalog.lookup("projects", path=path)
+
+    assert entry_id == "alpha"
+    assert isinstance(record, catalog.LazyMap)
+    assert list(record)[:3] == ["title", "description", "stars"]
+    assert record["stars"] == 12 and record["score"] == 0.25
+    assert record["featured"] is True and record["archived"] is False
+    assert record["video_url"] is None
+    assert "missing" not in record
+    with pytest.raises(KeyError):
+        record["missing"]
+
+    tags = record["tags"]
+    assert isinstance(tags, catalog.LazyList)
+    assert len(tags) == 3
+    assert tags[-1][1] == 3
+    assert tags[:2] == ["python", "shared text"]
+    with pytest.raises(IndexError):
+        tags[3]
+    assert record["links"].get("Demo") == "https://demo.example"
+
+
+def test_strings_are_stored_once(compiled):
+    path, _ = compiled
+    opened = catalog.Catalog(path)
+    strings = [opened.string(sid) for sid in range(opened._n_strings)]
+
+    assert len(strings) == len(set(strings))
+    assert "shared text" in strings and "Alpha ✓" in strings
+
+
+def test_other_files_are_rejected(tree):
+    path = tree / "catalog.bin"
+    path.write_bytes(b"not a catalog at all, just some bytes padding the header")
+    assert catalog.current(str(path)) is None
+
+    catalog.compile_catalog(str(path))
+    data = bytearray(path.read_bytes())
+    data[4] = catalog.VERSION + 1
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        catalog.Catalog(str(path))
+
+
+def test_edited_source_falls_back_to_json(compiled, monkeypatch):
+    path, _ = compiled
+    source = content.content_path("projects", "tenant")
+    edited = [dict(PROJECTS[1], title="Beta, edited")]
+    with open(source, "w") as f:
+        json.dump(edited, f)
+    stat = os.stat(source)
+    # Same size and a newer mtime must still count as an edit
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    assert catalog.lookup("projects", "tenant", path) is None
+    assert catalog.lookup("projects", path=path) is not None
+
+    monkeypatch.setattr(catalog, "lookup", functools.partial(catalog.lookup, path=path))
+    [(entry_id, _, fields)] = content._load("projects", "tenant")
+    assert (entry_id, fields["title"]) == ("beta", "Beta, edited")
+
+
+def test_recompile_is_picked_up(compiled):
+    path, _ = compiled
+    before = catalog.current(path)
+    assert catalog.current(path) is before
+
+    source = content.content_path("papers")
+    with open(source, "w") as f:
+        json.dump([dict(PAPERS[0], title="Paper, revised")], f)
+    catalog.compile_catalog(path)
+
+    after = catalog.current(path)
+    assert after is not before
+    [(_, _, record)] = catalog.lookup("papers", path=path)
+    assert record["title"] == "Paper, revised"
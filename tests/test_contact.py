@@ -0,0 +1,157 @@
+"""Contact form queue and delivery against a local stand-in SMTP server"""
+import socket
+import socketserver
+import threading
+from email import message_from_bytes
+
+import pytest
+
+from portfolio import contact
+
+
+class SMTPSink(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib; accepted messages go to server.messages"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 sink ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 sink")
+            elif command.startswith("MAIL"):
+                recipients = []
+                self.reply("250 OK")
+            elif command.startswith("RCPT"):
+                address = line.decode().split(":", 1)[1].strip(" <>\r\n")
+                if address in self.server.rejected:
+                    self.reply("550 no such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                data = b""
+                while (chunk := self.rfile.readline()) != b".\r\n":
+                    data += chunk
+                self.server.messages.append((recipients, message_from_bytes(data)))
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPSink)
+    server.daemon_threads = True
+    server.messages = []
+    server.rejected = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def settings(port):
+    return {
+        "host": "127.0.0.1", "port": port, "user": None, "password": None,
+        "starttls": False, "sender": "portfolio@localhost",
+    }
+
+
+def refused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_enqueue_rejects_bad_input(tmp_path):
+    with pytest.raises(contact.ValidationError):
+        contact.enqueue("me@example.com", "Ann", "not-an-address", "Hello there, nice work", str(tmp_path / "q.db"))
+    assert contact.queue_counts(str(tmp_path / "q.db")) == {}
+
+
+def test_queued_message_is_delivered(smtp, tmp_path):
+    path = str(tmp_path / "q.db")
+    contact.enqueue("me@example.com", "Ann", "ann@example.org", "Hello there, nice work", path)
+
+    assert contact.deliver_due(path, settings(smtp.server_address[1])) == 1
+    recipients, message = smtp.messages[0]
+    assert recipients == ["me@example.com"]
+    assert message["Reply-To"] == "Ann <ann@example.org>"
+    assert "Hello there, nice work" in message.get_payload()
+    assert contact.queue_counts(path) == {contact.SENT: 1}
+    # Nothing is due any more
+    assert contact.deliver_due(path, settings(smtp.server_address[1])) == 0
+
+
+def test_refused_connection_is_retried_later(smtp, tmp_path):
+    path = str(tmp_path / "q.db")
+    contact.enqueue("me@example.com", "Ann", "ann@example.org", "Hello there, nice work", path)
+
+    assert contact.deliver_due(path, settings(refused_port())) == 0
+    conn = contact.connect(path)
+    status, attempts, next_attempt_at, error = conn.execute(
+        "SELECT status, attempts, next_attempt_at, last_error FROM messages"
+    ).fetchone()
+    assert (status, attempts) == (contact.PENDING, 1)
+    assert "ConnectionRefused" in error
+
+    # Not due until the backoff has passed
+    assert contact.deliver_due(path, settings(smtp.server_address[1])) == 0
+    with conn:
+        conn.execute("UPDATE messages SET next_attempt_at = 0")
+    conn.close()
+    assert contact.deliver_due(path, settings(smtp.server_address[1])) == 1
+    assert contact.queue_counts(path) == {contact.SENT: 1}
+
+
+def test_rejected_recipient_does_not_block_the_batch(smtp, tmp_path):
+    path = str(tmp_path / "q.db")
+    smtp.rejected.add("gone@example.com")
+    contact.enqueue("gone@example.com", "Ann", "ann@example.org", "Hello there, nice work", path)
+    contact.enqueue("me@example.com", "Bob", "bob@example.org", "Another message here", path)
+
+    assert contact.deliver_due(path, settings(smtp.server_address[1])) == 1
+    assert [recipients for recipients, _ in smtp.messages] == [["me@example.com"]]
+    assert contact.queue_counts(path) == {contact.PENDING: 1, contact.SENT: 1}
+
+
+def test_token_bucket_allows_a_burst_then_refills():
+    bucket = {}
+    assert all(contact.allow_submission(bucket, now=0) for _ in range(contact.RATE_BURST))
+    assert not contact.allow_submission(bucket, now=1)
+    assert contact.allow_submission(bucket, now=1 + contact.RATE_REFILL)
+    assert not contact.allow_submission(bucket, now=2 + contact.RATE_REFILL)
+
+
+@pytest.mark.parametrize("name", ["Ann\rBcc: x@example.com", "Ann\nB", "Ann\x00"])
+def test_control_characters_in_name_are_rejected(name, tmp_path):
+    with pytest.raises(contact.ValidationError):
+        contact.enqueue("me@example.com", name, "ann@example.org", "Hello there, nice work", str(tmp_path / "q.db"))
+
+
+def test_unbuildable_message_fails_without_blocking_the_queue(smtp, tmp_path):
+    path = str(tmp_path / "q.db")
+    # Queued before validation was tightened
+    conn = contact.connect(path)
+    with conn:
+        conn.execute(
+            "INSERT INTO messages (created_at, recipient, name, email, body, next_attempt_at) "
+            "VALUES (0, 'me@example.com', 'Ann\rEve', 'ann@example.org', 'Hello there', 0)"
+        )
+    conn.close()
+    contact.enqueue("me@example.com", "Bob", "bob@example.org", "Another message here", path)
+
+    assert contact.deliver_due(path, settings(smtp.server_address[1])) == 1
+    assert contact.queue_counts(path) == {contact.FAILED: 1, contact.SENT: 1}
+    assert [message["Reply-To"] for _, message in smtp.messages] == ["Bob <bob@example.org>"]
@@ -0,0 +1,72 @@
+"""Content loading: media paths of non-default profiles stay in their directory"""
+import json
+import os
+
+import pytest
+
+from portfolio import content
+
+
+@pytest.fixture
+def tenant(tmp_path, monkeypatch):
+    profiles = tmp_path / "profiles"
+    directory = profiles / "tenant"
+    directory.mkdir(parents=True)
+    (directory / "media").mkdir()
+    (directory / "media" / "shot.png").write_bytes(b"png")
+    (tmp_path / "secret.db").write_bytes(b"secret")
+    os.symlink(tmp_path / "secret.db", directory / "media" / "link.db")
+    monkeypatch.setattr(content, "PROFILES_DIR", str(profiles))
+    return directory
+
+
+def write(directory, name, data):
+    (directory / name).write_text(json.dumps(data))
+
+
+def test_media_paths_outside_the_profile_are_dropped(tenant):
+    write(tenant, "projects.json", [{
+        "id": "p",
+        "title": "P",
+        "image_path": "media/shot.png",
+        "video_path": "../../secret.db",
+        "pdf_path": "/etc/passwd",
+        "gallery": ["media/shot.png", "media/link.db", {"path": "../secret.db", "caption": "x"}],
+    }])
+    [(entry_id, _, fields)] = content.parse_entries("projects", "tenant")
+
+    assert entry_id == "p"
+    assert fields["image_path"] == os.path.join(str(tenant), "media/shot.png")
+    assert "video_path" not in fields
+    assert "pdf_path" not in fields
+    assert fields["gallery"] == [os.path.join(str(tenant), "media/shot.png")]
+
+
+def test_photo_outside_the_profile_is_dropped(tenant):
+    write(tenant, "profile.json", {"name": "T", "photo": "../secret.db"})
+    assert "photo" not in content.read_profile("tenant")
+
+    write(tenant, "profile.json", {"name": "T", "photo": "media/shot.png"})
+    assert content.read_profile("tenant")["photo"] == os.path.join(str(tenant), "media/shot.png")
+
+
+def test_default_profile_paths_are_unchanged():
+    fields = {"image_path": "assets/photo.jpg"}
+    assert content._resolve_paths(dict(fields), content.DEFAULT_PROFILE) == fields
+
+
+def test_entries_survive_eviction_right_after_loading(monkeypatch):
+    from portfolio import cache
+
+    cache.records.invalidate(content.DEFAULT_PROFILE)
+    set_record = cache.records.set
+
+    def set_then_evict(key, value):
+        set_record(key, value)
+        if key == (content.DEFAULT_PROFILE, "projects"):
+            # Another session's profiles.activate evicting this profile
+            cache.records.invalidate(content.DEFAULT_PROFILE)
+
+    monkeypatch.setattr(cache.records, "set", set_then_evict)
+    rows = content.entries("projects")
+    assert [entry_id for entry_id, _ in rows] == [entry["id"] for entry in content.read_entries("projects")]
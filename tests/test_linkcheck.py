@@ -0,0 +1,131 @@
+"""Link checker against a local stand-in HTTP server"""
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from portfolio import linkcheck
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/old":
+            self.send_response(301)
+            self.send_header("Location", "/paper")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path == "/paper":
+            body = b"<html><head><title>A  Paper</title></head></html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/down":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def truncated_url():
+    """A raw server that promises a chunk of HTML and hangs up halfway"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(4096)
+                conn.sendall(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n"
+                    b"Transfer-Encoding: chunked\r\n\r\n400\r\n<html><title>cut"
+                )
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}/"
+    listener.close()
+
+
+@pytest.fixture
+def refused_url():
+    # A port nobody listens on
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/"
+
+
+def test_redirect_is_followed(server, tmp_path):
+    path = str(tmp_path / "links.json")
+    results = linkcheck.refresh([f"{server}/old"], path=path)
+    result = results[f"{server}/old"]
+    assert result["status"] == 200
+    assert result["final_url"] == f"{server}/paper"
+    assert result["title"] == "A Paper"
+    assert not linkcheck.is_broken(f"{server}/old", path)
+
+
+def test_missing_page_is_broken(server, tmp_path):
+    path = str(tmp_path / "links.json")
+    linkcheck.refresh([f"{server}/missing"], path=path)
+    assert linkcheck.is_broken(f"{server}/missing", path)
+
+
+def test_transient_failures_are_broken_only_when_repeated(server, refused_url, tmp_path):
+    path = str(tmp_path / "links.json")
+    urls = [refused_url, f"{server}/down"]
+    for attempt in range(1, linkcheck.MAX_FAILURES + 1):
+        # ttl=0 re-checks every URL on each pass
+        results = linkcheck.refresh(urls, ttl=0, path=path)
+        assert results[refused_url]["error"]
+        assert results[refused_url]["failures"] == attempt
+        broken = attempt >= linkcheck.MAX_FAILURES
+        assert linkcheck.is_broken(refused_url, path) is broken
+        assert linkcheck.is_broken(f"{server}/down", path) is broken
+
+
+def test_truncated_body_is_recorded_without_losing_other_results(server, truncated_url, tmp_path):
+    path = str(tmp_path / "links.json")
+    results = linkcheck.refresh([truncated_url, f"{server}/paper"], path=path)
+    assert "IncompleteReadError" in results[truncated_url]["error"]
+    assert results[f"{server}/paper"]["status"] == 200
+    assert set(linkcheck.load_results(path)) == {truncated_url, f"{server}/paper"}
+
+
+def test_success_resets_failures(server, tmp_path):
+    path = str(tmp_path / "links.json")
+    url = f"{server}/paper"
+    linkcheck.save_results({url: {"error": "TimeoutError: ", "failures": 5, "checked_at": 0}}, path)
+    results = linkcheck.refresh([url], path=path)
+    assert "failures" not in results[url]
+    assert not linkcheck.is_broken(url, path)
+
+
+def test_expired_presigned_url_is_broken_without_a_request(tmp_path):
+    url = "https://bucket.example/paper.pdf?X-Amz-Date=20200101T000000Z&X-Amz-Expires=3600"
+    results = linkcheck.refresh([url], path=str(tmp_path / "links.json"))
+    assert results[url]["expired"]
+    assert linkcheck.is_broken(url, str(tmp_path / "links.json"))
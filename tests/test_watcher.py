@@ -0,0 +1,19 @@
+"""Content watcher thread lifecycle"""
+import time
+
+from portfolio import watcher
+
+
+def test_change_is_dispatched_and_thread_stops(tmp_path):
+    batches = []
+    thread = watcher.ContentWatcher([str(tmp_path)], batches.append, interval=0.02, debounce=0.05)
+    thread.start()
+    time.sleep(0.1)
+    (tmp_path / "projects.json").write_text("[]")
+    deadline = time.monotonic() + 5
+    while not batches and time.monotonic() < deadline:
+        time.sleep(0.02)
+    thread.stop()
+    thread.join(2)
+    assert not thread.is_alive()
+    assert [{str(path) for path in batch} for batch in batches] == [{str(tmp_path / "projects.json")}]